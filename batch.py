@@ -0,0 +1,26 @@
+import argparse
+from utils.batch import DEFAULT_SEGMENT_FRAMES, run_batch
+from utils.detection import load_face_recognition
+
+def main():
+    parser = argparse.ArgumentParser(description="Run recorded videos through the face pipeline offline")
+    parser.add_argument('videos', nargs='+', help="Video files to process")
+    parser.add_argument('-o', '--output', default='detections.jsonl', help="JSONL output file")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--segment-frames', type=int, default=DEFAULT_SEGMENT_FRAMES, help="Frames per parallel segment")
+    parser.add_argument('--stride', type=int, default=1, help="Process every N-th frame")
+    args = parser.parse_args()
+
+    if not load_face_recognition():
+        print("No known faces in 'face' folder, running in detection-only mode")
+
+    stats = run_batch(args.videos, args.output, workers=args.workers,
+                      segment_frames=max(1, args.segment_frames), stride=max(1, args.stride))
+
+    print(f"Processed {stats['frames']} frames from {stats['files']} files "
+          f"({stats['segments']} segments) in {stats['seconds']:.1f}s")
+    print(f"Throughput: {stats['fps']:.1f} frames/sec")
+    print(f"Wrote {stats['detections']} detections to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import json
+from utils.benchmark import find_face_image, run_benchmark
+from utils.detection import load_face_recognition
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-camera soak and capacity benchmark")
+    parser.add_argument('--videos', nargs='*', default=None, help="Video files to loop (default: generated frames)")
+    parser.add_argument('--face-image', default=None, help="Face image moved across generated frames (default: first image in 'face' folder)")
+    parser.add_argument('--counts', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32], help="Camera counts to test")
+    parser.add_argument('--duration', type=float, default=60.0, help="Measured seconds per camera count")
+    parser.add_argument('--warmup', type=float, default=5.0, help="Seconds ignored at the start of each run")
+    parser.add_argument('--fps', type=float, default=15.0, help="Source and target FPS per camera")
+    parser.add_argument('--motion-threshold', type=float, default=None, help="Enable motion gating with this threshold")
+    parser.add_argument('--no-scheduler', action='store_true', help="Let every camera detect as fast as it can")
+    parser.add_argument('--log-latency', type=float, default=0.0, help="Simulated seconds per access_log insert")
+    parser.add_argument('--latency-budget', type=float, default=500.0, help="p95 latency budget in ms")
+    parser.add_argument('--label', default=None, help="Release or build label stored in the report")
+    parser.add_argument('-o', '--output', default='capacity_report.json', help="JSON report file")
+    args = parser.parse_args()
+
+    face_image = args.face_image
+    if not args.videos and face_image is None:
+        face_image = find_face_image()
+        if face_image is None:
+            parser.error("No face image found in 'face' folder; pass --face-image or --videos")
+
+    if not load_face_recognition():
+        print("No known faces in 'face' folder, running in detection-only mode")
+
+    report = run_benchmark(
+        camera_counts=args.counts,
+        duration=args.duration,
+        latency_budget_ms=args.latency_budget,
+        warmup=args.warmup,
+        videos=args.videos,
+        fps=args.fps,
+        face_image=face_image,
+        motion_threshold=args.motion_threshold,
+        use_scheduler=not args.no_scheduler,
+        log_latency=args.log_latency
+    )
+    report['label'] = args.label
+
+    print(f"Capacity: {report['capacity']} cameras within {args.latency_budget:.0f} ms p95")
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
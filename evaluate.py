@@ -0,0 +1,51 @@
+import argparse
+import json
+import numpy as np
+from utils.evaluation import run_evaluation
+
+def to_json(value):
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return np.round(value, 6).tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate recognition accuracy on a labeled face folder")
+    parser.add_argument('folder', nargs='?', default='face', help="Folder with one sub-folder per person")
+    parser.add_argument('--cache', default=None, help="Reuse or store embeddings in this .npz file")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000], help="Gallery sizes for the scaling test")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default=None, help="Write the full report (ROC curves included) as JSON")
+    args = parser.parse_args()
+
+    report = run_evaluation(args.folder, cache_path=args.cache, gallery_sizes=args.sizes, seed=args.seed)
+
+    verification = report['verification']
+    current = report['current_threshold']
+    print(f"{report['images']} images, {report['identities']} identities, "
+          f"{report['genuine_pairs']} genuine / {report['impostor_pairs']} impostor pairs")
+    print(f"EER {verification['eer']:.4f} at threshold {verification['eer_threshold']:.3f}")
+    print(f"Current threshold {current['threshold']}: FAR {current['far']:.4f}, FRR {current['frr']:.4f}")
+
+    for mode, curve in report['identification'].items():
+        index = min(int(np.searchsorted(curve['thresholds'], current['threshold'])), len(curve['thresholds']) - 1)
+        print(f"[{mode}] {curve['templates']} templates, {curve['search_us_per_query']:.1f} us/query, "
+              f"DIR {curve['detect_identify_rate'][index]:.4f}, "
+              f"misidentified {curve['misidentify_rate'][index]:.4f}, "
+              f"stranger accepted {curve['false_accept_rate'][index]:.4f}")
+
+    for row in report['scaling']:
+        print(f"gallery {row['gallery_size']:>7}: {row['search_us_per_query']:.1f} us/query, "
+              f"rank-1 {row['rank1_accuracy']:.4f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(to_json(report), f)
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,19 @@
 # app.py
 import cv2
-import threading
+import os
 import time
 import customtkinter as ctk
 import re
-from utils.detection import load_face_recognition, detect_faces, draw_detections, face_recognition_data
+from urllib.parse import urlsplit
+from utils.camera import CameraStream
+from utils.detection import load_face_recognition, draw_detections, face_recognition_data
 from utils.database import sync_face_folder, supabase
+from utils.events import EventServer, snapshot_tracks, track_events, track_payload
+from utils.identity_cache import identity_cache
 from utils.logging import FaceDetectionLogger
-from utils.tracking import TrackedFace, compute_iou
-
-class CameraStream:
-    def __init__(self, stream_source, camera_id):
-        self.stream_source = stream_source
-        self.camera_id = camera_id
-        self.stream = None
-        self.stop_event = threading.Event()
-        self.thread_read = None
-        self.thread_detect = None
-        self.latest_frame = [None]
-        self.frame_lock = threading.Lock()
-        self.latest_result = [None]
-        self.result_lock = threading.Lock()
-        self.tracked_faces = {}
-        self.face_id_counter = 0
-        self.frame_count = 0
-        self.start_time = time.time()
-        self.init_complete = threading.Event()
-
-        self.yunet = cv2.FaceDetectorYN.create(
-            model="model/yunet.onnx",
-            config="",
-            input_size=(160, 160),
-            score_threshold=0.6,
-            nms_threshold=0.4,
-            top_k=50
-        )
-        self.recognizer_net = cv2.dnn.readNetFromONNX('model/mobilefacenet.onnx')
-
-    def start(self):
-        self.stream = cv2.VideoCapture(self.stream_source)
-        if not self.stream.isOpened():
-            print(f"Cannot open stream {self.stream_source}")
-            return False
-
-        self.stop_event.clear()
-        self.thread_read = threading.Thread(
-            target=self.read_frames,
-            args=(self.stream, self.latest_frame, self.frame_lock, self.stop_event)
-        )
-        self.thread_detect = threading.Thread(
-            target=detect_faces,
-            args=(self.latest_frame, self.frame_lock, self.latest_result,
-                  self.result_lock, self.stop_event, self.yunet, self.recognizer_net)
-        )
-
-        self.thread_read.start()
-        self.init_complete.set()
-        self.thread_detect.start()
-        return True
-
-    def read_frames(self, stream, latest_frame, frame_lock, stop_event):
-        while not stop_event.is_set():
-            ret, frame = stream.read()
-            if not ret:
-                break
-            with frame_lock:
-                latest_frame[0] = frame.copy()
-
-    def stop(self):
-        if self.stop_event:
-            self.stop_event.set()
-        if self.thread_read:
-            self.thread_read.join()
-        if self.thread_detect:
-            self.thread_detect.join()
-        if self.stream:
-            self.stream.release()
-
-        self.stop_event = threading.Event()
-        self.thread_read = None
-        self.thread_detect = None
-        self.stream = None
+from utils.scheduler import DetectionScheduler
+from utils.snapshots import LocalSnapshotStorage, StrangerSnapshots, SupabaseSnapshotStorage
+from utils.tracing import tracer
 
 class ModernFaceDetectionApp:
     def __init__(self):
@@ -90,6 +23,20 @@ class ModernFaceDetectionApp:
 
         self._camera_sources = []
         self.logger = FaceDetectionLogger()
+        self.scheduler = DetectionScheduler()
+        # CAMERA_OPTIONS="0=15:2:0.02;192.168.1.20=8:0.5:off": nguồn=fps:độ ưu tiên:ngưỡng chuyển động
+        # ("off" tắt lọc chuyển động), "*" áp dụng cho mọi nguồn còn lại
+        self.camera_options = self.parse_camera_options(os.getenv('CAMERA_OPTIONS', ''))
+        self.event_server = EventServer(
+            host=os.getenv('EVENT_SERVER_HOST', '127.0.0.1'),
+            port=int(os.getenv('EVENT_SERVER_PORT', '8765'))
+        )
+        self.camera_presence = {}
+        if os.getenv('SNAPSHOT_DIR'):
+            snapshot_storage = LocalSnapshotStorage(os.getenv('SNAPSHOT_DIR'))
+        else:
+            snapshot_storage = SupabaseSnapshotStorage()
+        self.snapshots = StrangerSnapshots(snapshot_storage)
         self.camera_streams = []
         self.last_stats_time = time.time()
         self.current_camera_index = 0
@@ -98,6 +45,7 @@ class ModernFaceDetectionApp:
         self.previous_stranger_count = -1
         self.previous_known_faces = frozenset()
         self.has_initial_camera = False
+        self.frame_tick = 0
 
         self.login_frame = ctk.CTkFrame(self.root)
         self.login_frame.pack(fill="both", expand=True, padx=20, pady=20)
@@ -155,6 +103,13 @@ class ModernFaceDetectionApp:
         )
         self.familiar_label.pack(pady=10)
 
+        self.scheduler_label = ctk.CTkLabel(
+            self.stats_frame,
+            text="Detection rate: ",
+            font=("Helvetica", 12)
+        )
+        self.scheduler_label.pack(pady=10)
+
         self.control_frame = ctk.CTkFrame(self.main_frame)
         self.control_frame.pack(fill="x", padx=10, pady=20)
 
@@ -182,6 +137,14 @@ class ModernFaceDetectionApp:
         )
         self.remove_camera_button.pack(pady=10, padx=20, fill="x")
 
+        self.trace_button = ctk.CTkButton(
+            self.control_frame,
+            text="Start Trace",
+            command=self.toggle_trace,
+            font=("Helvetica", 14)
+        )
+        self.trace_button.pack(pady=10, padx=20, fill="x")
+
         self.nav_frame = ctk.CTkFrame(self.control_frame)
         self.nav_frame.pack(fill="x", pady=10)
 
@@ -253,6 +216,7 @@ class ModernFaceDetectionApp:
                 self.main_frame.pack(fill="both", expand=True, padx=20, pady=20)
                 self.logout_button.pack(pady=10, padx=20)
                 self.init_face_recognition()
+                self.event_server.start()
                 self.set_initial_camera_source()
                 self.update_frame()
             else:
@@ -269,11 +233,14 @@ class ModernFaceDetectionApp:
                 for camera_stream in self.camera_streams:
                     if camera_stream:
                         camera_stream.stop()
+                        self.snapshots.forget_camera(camera_stream.camera_id)
 
             self.camera_streams = []
             self._camera_sources = []
             self.current_camera_index = 0
             self.has_initial_camera = False
+            self.camera_presence = {}
+            self.event_server.stop()
 
             self.main_frame.pack_forget()
             self.logout_button.pack_forget()
@@ -324,6 +291,7 @@ class ModernFaceDetectionApp:
 
         for camera_stream in self.camera_streams:
             camera_stream.stop()
+            self.snapshots.forget_camera(camera_stream.camera_id)
 
         self.camera_streams = []
         self.current_camera_index = 0
@@ -357,6 +325,41 @@ class ModernFaceDetectionApp:
 
         return source
     
+    def parse_camera_options(self, value):
+        options = {}
+        for entry in value.split(';'):
+            source, _, settings = entry.strip().rpartition('=')
+            if not source:
+                continue
+            fps, priority, motion = (settings.split(':') + ['', ''])[:3]
+            camera_options = {}
+            try:
+                camera_options['target_fps'] = float(fps or 15.0)
+                camera_options['priority'] = float(priority or 1.0)
+                if motion.strip().lower() == 'off':
+                    camera_options['motion_threshold'] = None
+                elif motion:
+                    camera_options['motion_threshold'] = float(motion)
+            except ValueError:
+                print(f"Ignoring invalid camera options: {entry}")
+                continue
+            # fps phải dương (scheduler chia cho fps), độ ưu tiên không âm, ngưỡng chuyển động là tỉ lệ điểm ảnh
+            motion_threshold = camera_options.get('motion_threshold')
+            if (camera_options['target_fps'] > 0 and camera_options['priority'] >= 0 and
+                    (motion_threshold is None or 0 <= motion_threshold <= 1)):
+                options[source.strip()] = camera_options
+            else:
+                print(f"Ignoring invalid camera options: {entry}")
+        return options
+
+    def create_camera(self, source, camera_id):
+        # Khớp theo nguồn đầy đủ, sau đó theo địa chỉ IP của stream
+        host = urlsplit(source).hostname if isinstance(source, str) else None
+        for key in (str(source), host, '*'):
+            if key in self.camera_options:
+                return CameraStream(source, camera_id, self.scheduler, **self.camera_options[key])
+        return CameraStream(source, camera_id, self.scheduler)
+
     def set_initial_camera_source(self):
         camera_source = self.set_camera_source()
         if camera_source is None:
@@ -366,7 +369,7 @@ class ModernFaceDetectionApp:
 
         self._camera_sources.append(camera_source)
         camera_id = len(self.camera_streams) + 1
-        first_camera = CameraStream(camera_source, camera_id)
+        first_camera = self.create_camera(camera_source, camera_id)
         if first_camera.start():
             self.camera_streams.append(first_camera)
             self.has_initial_camera = True
@@ -388,7 +391,7 @@ class ModernFaceDetectionApp:
                 return
 
             camera_id = len(self.camera_streams) + 1
-            new_camera = CameraStream(new_source, camera_id)
+            new_camera = self.create_camera(new_source, camera_id)
             if new_camera.start():
                 self.camera_streams.append(new_camera)
                 if preset_source is None:
@@ -401,6 +404,7 @@ class ModernFaceDetectionApp:
         if len(self.camera_streams) > 0:
             camera_stream = self.camera_streams.pop()
             camera_stream.stop()
+            self.snapshots.forget_camera(camera_stream.camera_id)
             if self._camera_sources:
                 self._camera_sources.pop()
             self.status_label.configure(text=f"Removed camera {camera_stream.camera_id}")
@@ -419,6 +423,34 @@ class ModernFaceDetectionApp:
             self.current_camera_index = (self.current_camera_index + 1) % len(self.camera_streams)
             self.status_label.configure(text=f"Switched to camera {self.current_camera_index + 1}")
 
+    def toggle_trace(self):
+        if not tracer.enabled:
+            dialog = ctk.CTkInputDialog(
+                text="Trace every Nth frame (1 traces all frames):",
+                title="Start Trace"
+            )
+            sample_every = dialog.get_input()
+            if sample_every is None:
+                return
+            sample_every = sample_every.strip() or "1"
+            if not sample_every.isdigit() or int(sample_every) < 1:
+                self.status_label.configure(text="Invalid trace sampling rate.")
+                return
+            tracer.start(int(sample_every))
+            self.trace_button.configure(text="Stop Trace")
+            self.status_label.configure(text="Tracing pipeline...")
+            return
+
+        tracer.stop()
+        self.trace_button.configure(text="Start Trace")
+        trace_path = time.strftime("trace_%Y%m%d_%H%M%S.json")
+        try:
+            event_count = tracer.export(trace_path)
+            self.status_label.configure(text=f"Saved {event_count} trace events to {trace_path}")
+        except Exception as e:
+            print(f"Error exporting trace: {str(e)}")
+            self.status_label.configure(text="Failed to export trace")
+
     def update_stats(self, num_strangers, known_names):
         if num_strangers != self.previous_stranger_count:
             self.stranger_label.configure(text=f"Stranger: {num_strangers}")
@@ -428,10 +460,40 @@ class ModernFaceDetectionApp:
             self.familiar_label.configure(text=f"Familiar face: {', '.join(known_names)}")
             self.previous_known_faces = frozenset(known_names)
 
+        motion_gates = {camera_stream.camera_id: camera_stream.motion_gate for camera_stream in self.camera_streams}
+        rates = []
+        for row in self.scheduler.report():
+            rate = f"Cam {row['camera_id']}: {row['achieved_fps']:.1f}/{row['target_fps']:.0f} fps"
+            if motion_gates.get(row['camera_id']) is not None:
+                rate += f" ({motion_gates[row['camera_id']].stats()['skip_ratio']:.0%} static)"
+            rates.append(rate)
+        cache_stats = identity_cache.stats()
+        self.scheduler_label.configure(text=f"Detection rate: {', '.join(rates)} | "
+                                            f"Identity cache: {cache_stats['hit_ratio']:.0%} hits")
+
+    def publish_events(self, camera_stream, previous_tracks, camera_known, camera_unknown):
+        camera_id = camera_stream.camera_id
+        if camera_stream.tracked_faces:
+            self.event_server.publish('detection', camera_id, track_payload(camera_stream.tracked_faces))
+
+        for event, data in track_events(previous_tracks, camera_stream.tracked_faces):
+            data['event'] = event
+            self.event_server.publish('track', camera_id, data)
+
+        presence = (frozenset(camera_known), camera_unknown)
+        if self.camera_presence.get(camera_id) != presence:
+            self.camera_presence[camera_id] = presence
+            self.event_server.publish('presence', camera_id, {
+                'face_name': sorted(camera_known),
+                'stranger': camera_unknown
+            })
+
     def on_closing(self):
         if self.camera_streams:
             for camera_stream in self.camera_streams:
                 camera_stream.stop()
+        self.event_server.stop()
+        self.snapshots.stop()
         cv2.destroyAllWindows()
         self.root.destroy()
 
@@ -450,84 +512,45 @@ class ModernFaceDetectionApp:
         known_names_set = set()
         frame_to_display = None
         
-        MIN_CONFIDENCE_FRAMES = 2 
-
-        MAX_MISSING_FRAMES = 3    
-
         for idx, camera_stream in enumerate(self.camera_streams):
             with camera_stream.result_lock:
                 if camera_stream.latest_result[0] is not None:
-                    frame, detections = camera_stream.latest_result[0]
+                    frame, detections, seq, capture_time = camera_stream.latest_result[0]
                     camera_stream.latest_result[0] = None
 
-                    new_tracked_faces = {}
-                    detected_face_ids = set()
-
-                    for detection in detections:
-                        bbox = detection['bbox']
-                        name = detection['name']
-                        recognized = detection['recognized']
-
-                        matched_face_id = None
-                        max_iou = 0
-                        
-                        for face_id, tracked_face in camera_stream.tracked_faces.items():
-                            iou = compute_iou(bbox, tracked_face.bbox)
-                            if iou > 0.35 and iou > max_iou:
-                                max_iou = iou
-                                matched_face_id = face_id
-
-                        if matched_face_id is not None:
-                            tracked_face = camera_stream.tracked_faces[matched_face_id]
-                            tracked_face.bbox = bbox
-                            tracked_face.confidence_count += 1
-                            tracked_face.missing_count = 0
-
-                            if tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES:
-                                if tracked_face.recognized != recognized or tracked_face.name != name:
-                                    tracked_face.name = name
-                                    tracked_face.recognized = recognized
-                                    tracked_face.state_duration = 0
-                                    tracked_face.current_state_start_time = current_time
-
-                            tracked_face.last_update_time = current_time
-                            new_tracked_faces[matched_face_id] = tracked_face
-                            detected_face_ids.add(matched_face_id)
-                        else:
-                            camera_stream.face_id_counter += 1
-                            new_face = TrackedFace(camera_stream.face_id_counter, bbox, name, recognized, current_time)
-                            new_tracked_faces[camera_stream.face_id_counter] = new_face
-                            detected_face_ids.add(camera_stream.face_id_counter)
-
-                    for face_id, tracked_face in camera_stream.tracked_faces.items():
-                        if face_id not in detected_face_ids:
-                            tracked_face.missing_count += 1
-                            tracked_face.confidence_count = max(0, tracked_face.confidence_count - 1)
-                            if tracked_face.missing_count < MAX_MISSING_FRAMES:
-                                new_tracked_faces[face_id] = tracked_face
-
-                    camera_stream.tracked_faces = new_tracked_faces
-
-                    for tracked_face in camera_stream.tracked_faces.values():
-                        if tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES:
-                            if tracked_face.recognized:
-                                known_names_set.add(tracked_face.name)
-                            else:
-                                num_unknown_total += 1
+                    tracer.bind(camera_stream.camera_id, seq)
+                    previous_tracks = snapshot_tracks(camera_stream.tracked_faces)
+                    camera_known, camera_unknown = camera_stream.apply_detections(detections, current_time)
+                    known_names_set |= camera_known
+                    num_unknown_total += camera_unknown
+
+                    with tracer.span('events'):
+                        self.publish_events(camera_stream, previous_tracks, camera_known, camera_unknown)
+
+                    with tracer.span('snapshots'):
+                        self.snapshots.observe(camera_stream.camera_id, frame,
+                                               camera_stream.tracked_faces, current_time)
 
                     if idx == self.current_camera_index:
-                        frame_with_detections = draw_detections(frame.copy(), camera_stream.tracked_faces)
+                        with tracer.span('rendering'):
+                            frame_with_detections = draw_detections(frame.copy(), camera_stream.tracked_faces)
                         frame_to_display = frame_with_detections
 
+        # Hiển thị và ghi log không thuộc về camera nào: gắn theo lượt update_frame
+        self.frame_tick += 1
+        tracer.sample(None, self.frame_tick)
+        tracer.bind(None, self.frame_tick)
         if frame_to_display is not None:
-            cv2.imshow('Face Detection', frame_to_display)
-            cv2.waitKey(1)
+            with tracer.span('rendering'):
+                cv2.imshow('Face Detection', frame_to_display)
+                cv2.waitKey(1)
 
         if current_time - self.last_stats_time >= 0.8:
             self.update_stats(num_unknown_total, list(known_names_set))
             
             if self.logger.should_update(current_time, num_unknown_total, known_names_set):
-                self.logger.update_log(num_unknown_total, list(known_names_set), current_time)
+                with tracer.span('logging'):
+                    self.logger.update_log(num_unknown_total, list(known_names_set), current_time)
                 
             self.last_stats_time = current_time
 
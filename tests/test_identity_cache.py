@@ -0,0 +1,25 @@
+import numpy as np
+from utils.identity_cache import IdentityCache
+
+def unit(vector):
+    return (vector / np.linalg.norm(vector)).astype('float32')
+
+def test_hits_do_not_drift_to_another_face():
+    rng = np.random.default_rng(0)
+    alice, other = unit(rng.normal(size=128)), unit(rng.normal(size=128))
+    cache = IdentityCache()
+    cache.add(alice, 'alice', 0.0)
+
+    names = [cache.lookup(unit((1 - w) * alice + w * other), 0.1 * step)
+             for step, w in enumerate(np.linspace(0, 1, 50))]
+    assert names[0] == 'alice'
+    assert names[-1] is None
+
+def test_entries_expire_after_max_age_even_with_hits():
+    alice = unit(np.ones(128))
+    cache = IdentityCache(ttl=30.0, max_age=5.0)
+    cache.add(alice, 'alice', 0.0)
+
+    assert [cache.lookup(alice, t) for t in (1.0, 3.0, 4.9, 6.0)] == ['alice', 'alice', 'alice', None]
+    cache.add(alice, 'alice', 6.0)
+    assert cache.lookup(alice, 10.0) == 'alice'
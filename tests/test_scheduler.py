@@ -0,0 +1,104 @@
+import threading
+import pytest
+from utils.scheduler import DetectionScheduler, simulate_load
+
+COST = 0.05
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def by_camera(report):
+    return {row['camera_id']: row for row in report}
+
+def run_cycle(scheduler, camera_id, cost, has_faces):
+    # Giống một lượt detect nhưng không chờ theo thời gian thật
+    scheduler.slots.acquire()
+    scheduler.finish(camera_id, cost, has_faces)
+
+def test_overload_follows_weights_and_sheds_idle_cameras_first():
+    clock = FakeClock()
+    scheduler = DetectionScheduler(max_concurrent=1, clock=clock)
+    # Nhu cầu 4 x 15 fps x 50 ms = 3 giây xử lý mỗi giây trên 1 slot (capacity 0.9)
+    for camera_id, weight in ((1, 3.0), (2, 1.0), (3, 1.0), (4, 1.0)):
+        scheduler.register(camera_id, 15.0, weight)
+
+    clock.now += 10.0
+    for camera_id, has_faces in ((1, True), (2, True), (3, False), (4, False)):
+        run_cycle(scheduler, camera_id, COST, has_faces)
+
+    report = by_camera(scheduler.report())
+    front, hallway, idle_a, idle_b = report[1], report[2], report[3], report[4]
+    # Trọng số 3 : 1 : 0.25 : 0.25 chia 0.9 giây xử lý mỗi giây, 50 ms mỗi lượt
+    assert front['allotted_fps'] == pytest.approx(12.0)
+    assert hallway['allotted_fps'] == pytest.approx(4.0)
+    for idle in (idle_a, idle_b):
+        assert idle['idle']
+        assert idle['allotted_fps'] == pytest.approx(1.0)
+        assert idle['allotted_fps'] >= scheduler.min_fps
+
+def test_min_fps_floor_for_low_weight_cameras():
+    clock = FakeClock()
+    scheduler = DetectionScheduler(max_concurrent=1, min_fps=2.0, clock=clock)
+    scheduler.register(1, 30.0, 10.0)
+    scheduler.register(2, 30.0, 0.1)
+
+    report = by_camera(scheduler.report())
+    assert report[1]['allotted_fps'] > report[2]['allotted_fps']
+    assert report[2]['allotted_fps'] == 2.0
+
+def test_all_cameras_reach_target_without_overload():
+    scheduler = DetectionScheduler(max_concurrent=1, clock=FakeClock())
+    for camera_id in range(1, 4):
+        scheduler.register(camera_id, 5.0, 1.0)
+        run_cycle(scheduler, camera_id, 0.02, True)
+
+    for row in scheduler.report():
+        assert row['allotted_fps'] == row['target_fps']
+
+def test_zero_weight_cameras_keep_min_fps():
+    scheduler = DetectionScheduler(max_concurrent=1, headroom=0.05, clock=FakeClock())
+    scheduler.register(1, 15.0, 0.0)
+    scheduler.register(2, 15.0, 0.0)
+
+    for row in scheduler.report():
+        assert row['allotted_fps'] == 1.0
+
+@pytest.mark.parametrize('target_fps, weight', [(0.0, 1.0), (-5.0, 1.0), (float('nan'), 1.0), (15.0, -1.0)])
+def test_register_rejects_invalid_schedule(target_fps, weight):
+    scheduler = DetectionScheduler(max_concurrent=1, clock=FakeClock())
+    with pytest.raises(ValueError):
+        scheduler.register(1, target_fps, weight)
+    assert scheduler.report() == []
+
+def test_cancel_with_reschedule_gives_back_the_period():
+    clock = FakeClock()
+    scheduler = DetectionScheduler(max_concurrent=1, clock=clock)
+    scheduler.register(1, target_fps=2.0)
+    stop_event = threading.Event()
+
+    assert scheduler.wait_turn(1, stop_event)
+    scheduler.cancel(1)
+    assert scheduler.cameras[1].next_due == clock.now + 0.5
+
+    clock.now += 0.5
+    assert scheduler.wait_turn(1, stop_event)
+    scheduler.cancel(1, reschedule=True)
+    assert scheduler.cameras[1].next_due == clock.now
+
+def test_simulated_load_tracks_allotment():
+    # Chạy thật với thread: chỉ kiểm tra thô để không phụ thuộc tải của máy CI
+    load = [
+        (1, 15.0, 3.0, 0.02, True),
+        (2, 15.0, 1.0, 0.02, True),
+    ]
+    report = by_camera(simulate_load(load, duration=3.0, max_concurrent=1, headroom=0.5))
+
+    assert report[1]['allotted_fps'] > report[2]['allotted_fps']
+    for row in report.values():
+        assert row['achieved_fps'] >= 0.5 * row['allotted_fps']
+        assert row['achieved_fps'] <= 1.5 * row['allotted_fps']
+        assert row['max_wait_ms'] < 1000
@@ -0,0 +1,29 @@
+from utils.tracing import Tracer
+
+def test_sampling_follows_handled_frames_and_keeps_capture_spans():
+    tracer = Tracer()
+    tracer.start(sample_every=2)
+    # Capture 30 fps, detect chỉ xử lý các seq chẵn: lấy mẫu theo seq sẽ chọn tất cả hoặc không frame nào
+    for seq in range(1, 41):
+        tracer.add_capture_span(1, seq, 'capture', seq, seq + 1)
+        if seq % 2 == 0:
+            tracer.sample(1, seq)
+            tracer.bind(1, seq)
+            with tracer.span('detection'):
+                pass
+
+    detect_seqs = sorted(event[4][1] for event in tracer.events if event[0] == 'detection')
+    capture_seqs = sorted(event[4][1] for event in tracer.events if event[0] == 'capture')
+    assert detect_seqs == list(range(2, 41, 4))
+    assert capture_seqs == detect_seqs
+
+def test_gui_bind_reuses_detect_decision():
+    tracer = Tracer()
+    tracer.start(sample_every=3)
+    sampled = [seq for seq in range(10, 20) if tracer.sample(1, seq)]
+
+    for seq in range(10, 20):
+        tracer.bind(1, seq)
+        with tracer.span('tracking'):
+            pass
+    assert sorted(event[4][1] for event in tracer.events) == sampled == [10, 13, 16, 19]
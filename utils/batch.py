@@ -0,0 +1,134 @@
+import json
+import math
+import os
+import time
+from multiprocessing import Pool
+import cv2
+from utils.detection import create_face_models, process_frame, set_known_faces, face_recognition_data
+from utils.tracking import MIN_CONFIDENCE_FRAMES, update_tracks
+
+DEFAULT_FPS = 30.0
+DEFAULT_SEGMENT_FRAMES = 900
+
+_worker_models = None
+
+def _init_worker(known_embeddings, known_names):
+    global _worker_models
+    # Mỗi process đã chạy song song, tránh để OpenCV tự mở thêm thread
+    cv2.setNumThreads(1)
+    set_known_faces(known_embeddings, known_names)
+    _worker_models = create_face_models()
+
+def get_video_info(path):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        return None, 0
+    fps = capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    capture.release()
+    return fps, frame_count
+
+def split_segments(paths, segment_frames, stride):
+    tasks = []
+    # Độ dài segment cố định theo số frame (không phụ thuộc số worker) nên cách chia luôn giống nhau
+    segment_length = math.ceil(segment_frames / stride) * stride
+    for file_index, path in enumerate(paths):
+        fps, frame_count = get_video_info(path)
+        if fps is None or frame_count <= 0:
+            print(f"Cannot open video {path}")
+            continue
+
+        for start in range(0, frame_count, segment_length):
+            end = min(start + segment_length, frame_count)
+            tasks.append((path, file_index, start, end, stride, fps))
+    return tasks
+
+def process_segment(task):
+    # Worker chỉ chạy detect/nhận diện; tracking cần toàn bộ lịch sử nên để process chính làm theo thứ tự
+    path, file_index, start, end, stride, fps = task
+    yunet, recognizer_net = _worker_models
+
+    capture = cv2.VideoCapture(path)
+    if start > 0:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    frames = []
+    for frame_index in range(start, end):
+        # Dùng chỉ số frame tuyệt đối nên tập frame được xử lý không phụ thuộc vào cách chia segment
+        if frame_index % stride != 0:
+            if not capture.grab():
+                break
+            continue
+
+        ret, frame = capture.read()
+        if not ret:
+            break
+
+        _, detections = process_frame(frame, yunet, recognizer_net)
+        for detection in detections:
+            # Embedding không dùng khi ghi kết quả, bỏ đi để giảm dữ liệu gửi về process chính
+            detection.pop('embedding', None)
+        frames.append((frame_index, detections))
+
+    capture.release()
+    return file_index, path, fps, frames
+
+def track_segment(path, fps, frames, tracked_faces, face_id_counter):
+    records = []
+    for frame_index, detections in frames:
+        timestamp = frame_index / fps
+        tracked_faces, face_id_counter = update_tracks(tracked_faces, detections, face_id_counter, timestamp)
+
+        for face_id, tracked_face in tracked_faces.items():
+            if tracked_face.missing_count > 0:
+                continue
+            records.append({
+                'file': path,
+                'frame': frame_index,
+                'timestamp': round(timestamp, 3),
+                'track_id': face_id,
+                'name': tracked_face.name,
+                'recognized': tracked_face.recognized,
+                'confirmed': tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES,
+                'bbox': [int(v) for v in tracked_face.bbox]
+            })
+    return records, tracked_faces, face_id_counter
+
+def run_batch(paths, output_path, workers=None, segment_frames=DEFAULT_SEGMENT_FRAMES, stride=1):
+    workers = workers or os.cpu_count() or 1
+    tasks = split_segments(paths, segment_frames, stride)
+
+    start_time = time.time()
+    total_frames = 0
+    total_records = 0
+    current_file = None
+    tracked_faces = {}
+    face_id_counter = 0
+
+    init_args = (face_recognition_data.known_embeddings, face_recognition_data.known_names)
+    with Pool(workers, initializer=_init_worker, initargs=init_args) as pool, \
+            open(output_path, 'w') as output:
+        # imap trả kết quả đúng thứ tự frame nên tracking ở đây giống hệt khi chạy liền một mạch
+        for file_index, path, fps, frames in pool.imap(process_segment, tasks):
+            if file_index != current_file:
+                current_file = file_index
+                tracked_faces = {}
+                face_id_counter = 0
+            records, tracked_faces, face_id_counter = track_segment(path, fps, frames,
+                                                                   tracked_faces, face_id_counter)
+
+            total_frames += len(frames)
+            total_records += len(records)
+            for record in records:
+                output.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    elapsed = time.time() - start_time
+    throughput = total_frames / elapsed if elapsed > 0 else 0.0
+    return {
+        'files': len(paths),
+        'segments': len(tasks),
+        'frames': total_frames,
+        'detections': total_records,
+        'seconds': elapsed,
+        'fps': throughput
+    }
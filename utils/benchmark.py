@@ -0,0 +1,213 @@
+import os
+import sys
+import time
+import numpy as np
+from utils.camera import CameraStream
+from utils.logging import FaceDetectionLogger
+from utils.scheduler import DetectionScheduler
+from utils.sources import LoopingVideoCapture, SyntheticCapture
+
+MAX_SERIES_POINTS = 120
+
+class StubQuery:
+    def __init__(self, client, table_name):
+        self.client = client
+        self.table_name = table_name
+
+    def insert(self, data):
+        self.data = data
+        return self
+
+    def execute(self):
+        if self.client.latency > 0:
+            time.sleep(self.client.latency)
+        self.client.inserts += 1
+        return self.data
+
+class StubSupabaseClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.inserts = 0
+
+    def table(self, table_name):
+        return StubQuery(self, table_name)
+
+class LatencyHistogram:
+    # Bộ đếm cấp phát sẵn theo từng ms: bộ nhớ không tăng theo thời gian soak nên không ảnh hưởng độ dốc RSS
+    def __init__(self, max_ms=10000):
+        self.counts = np.zeros(max_ms + 1, dtype=np.int64)
+
+    def add(self, seconds):
+        self.counts[min(len(self.counts) - 1, max(0, int(seconds * 1000)))] += 1
+
+    def percentile(self, percent):
+        total = self.counts.sum()
+        if total == 0:
+            return 0.0
+        return float(np.searchsorted(np.cumsum(self.counts), total * percent / 100.0))
+
+def read_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+
+    # Không có /proc: dùng RSS lớn nhất (macOS trả về byte, Linux trả về KB)
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+
+def downsample(samples, max_points=MAX_SERIES_POINTS):
+    # Lấy trung bình từng khối để chuỗi trong báo cáo soak dài vẫn gọn
+    if len(samples) <= max_points:
+        return [round(float(value), 1) for value in samples]
+    return [round(float(np.mean(block)), 1) for block in np.array_split(np.array(samples), max_points)]
+
+def rss_slope_mb_per_min(sample_times, rss_samples):
+    # Độ dốc RSS dương kéo dài trong lần chạy soak là dấu hiệu rò rỉ bộ nhớ
+    if len(rss_samples) < 2:
+        return 0.0
+    return float(np.polyfit(np.array(sample_times) / 60.0, rss_samples, 1)[0])
+
+def find_face_image(face_folder='face'):
+    # Ảnh đầu tiên trong thư mục khuôn mặt đã đồng bộ, để frame giả lập đi qua đủ detect/nhận diện/tracking
+    if not os.path.isdir(face_folder):
+        return None
+    for person_name in sorted(os.listdir(face_folder)):
+        person_folder = os.path.join(face_folder, person_name)
+        if os.path.isdir(person_folder):
+            for filename in sorted(os.listdir(person_folder)):
+                if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                    return os.path.join(person_folder, filename)
+    return None
+
+def make_source(index, videos, fps, face_image):
+    if videos:
+        return LoopingVideoCapture(videos[index % len(videos)], fps)
+    return SyntheticCapture(fps=fps, face_image=face_image, seed=index)
+
+def run_scenario(num_cameras, duration, warmup=5.0, videos=None, fps=15.0, face_image=None,
+                 motion_threshold=None, use_scheduler=True, log_latency=0.0):
+    if not videos and face_image is None:
+        raise ValueError("Benchmark needs videos or a face image, noise-only frames never reach recognition")
+    scheduler = DetectionScheduler() if use_scheduler else None
+    client = StubSupabaseClient(latency=log_latency)
+    logger = FaceDetectionLogger(client)
+
+    camera_streams = []
+    for index in range(num_cameras):
+        camera_stream = CameraStream(make_source(index, videos, fps, face_image), index + 1, scheduler,
+                                     target_fps=fps, motion_threshold=motion_threshold)
+        if camera_stream.start():
+            camera_streams.append(camera_stream)
+
+    processed = {camera_stream.camera_id: 0 for camera_stream in camera_streams}
+    latencies = LatencyHistogram()
+    cpu_samples = []
+    rss_samples = []
+    sample_times = []
+
+    start_time = time.time()
+    measure_start = start_time + warmup
+    end_time = measure_start + duration
+    last_sample_time = start_time
+    last_cpu_time = time.process_time()
+    last_stats_time = start_time
+
+    # Vòng lặp giống update_frame trong gui/app.py nhưng không hiển thị
+    while time.time() < end_time:
+        current_time = time.time()
+        measuring = current_time >= measure_start
+        num_unknown_total = 0
+        known_names_set = set()
+
+        for camera_stream in camera_streams:
+            with camera_stream.result_lock:
+                result = camera_stream.latest_result[0]
+                camera_stream.latest_result[0] = None
+            if result is None:
+                continue
+
+            frame, detections, seq, capture_time = result
+            camera_known, camera_unknown = camera_stream.apply_detections(detections, current_time)
+            known_names_set |= camera_known
+            num_unknown_total += camera_unknown
+
+            if measuring:
+                processed[camera_stream.camera_id] += 1
+                latencies.add(time.time() - capture_time)
+
+        if current_time - last_stats_time >= 0.8:
+            if logger.should_update(current_time, num_unknown_total, known_names_set):
+                logger.update_log(num_unknown_total, list(known_names_set), current_time)
+            last_stats_time = current_time
+
+        if current_time - last_sample_time >= 1.0:
+            cpu_time = time.process_time()
+            if measuring:
+                cpu_samples.append(100.0 * (cpu_time - last_cpu_time) / (current_time - last_sample_time))
+                rss_samples.append(read_rss_mb())
+                sample_times.append(current_time - measure_start)
+            last_cpu_time = cpu_time
+            last_sample_time = current_time
+
+        time.sleep(0.01)
+
+    scheduler_report = scheduler.report() if scheduler is not None else []
+    for camera_stream in camera_streams:
+        camera_stream.stop()
+
+    camera_fps = np.array([count / duration for count in processed.values()]) if processed else np.zeros(1)
+    return {
+        'cameras': num_cameras,
+        'started': len(camera_streams),
+        'target_fps': fps,
+        'fps_mean': float(camera_fps.mean()),
+        'fps_min': float(camera_fps.min()),
+        'fps_total': float(camera_fps.sum()),
+        'latency_p50_ms': latencies.percentile(50),
+        'latency_p95_ms': latencies.percentile(95),
+        'latency_p99_ms': latencies.percentile(99),
+        'cpu_percent': float(np.mean(cpu_samples)) if cpu_samples else 0.0,
+        'cpu_percent_max': float(np.max(cpu_samples)) if cpu_samples else 0.0,
+        'rss_mb_max': float(np.max(rss_samples)) if rss_samples else read_rss_mb(),
+        'rss_slope_mb_per_min': rss_slope_mb_per_min(sample_times, rss_samples),
+        'cpu_percent_series': downsample(cpu_samples),
+        'rss_mb_series': downsample(rss_samples),
+        'log_inserts': client.inserts,
+        'scheduler': scheduler_report
+    }
+
+def run_benchmark(camera_counts=(1, 2, 4, 8, 16, 32), duration=60.0, latency_budget_ms=500.0,
+                  min_fps_ratio=0.8, **scenario_options):
+    scenarios = []
+    capacity = 0
+    saturated = False
+    for num_cameras in camera_counts:
+        result = run_scenario(num_cameras, duration, **scenario_options)
+        result['within_budget'] = (result['latency_p95_ms'] <= latency_budget_ms and
+                                   result['fps_min'] >= min_fps_ratio * result['target_fps'])
+        scenarios.append(result)
+        print(f"{num_cameras:>3} cameras: {result['fps_mean']:.1f} fps/camera (min {result['fps_min']:.1f}), "
+              f"p95 {result['latency_p95_ms']:.0f} ms, CPU {result['cpu_percent']:.0f}%, "
+              f"RSS {result['rss_mb_max']:.0f} MB ({result['rss_slope_mb_per_min']:+.2f} MB/min)")
+        # Dung lượng là số camera lớn nhất trước lần đầu tiên vượt ngưỡng
+        if result['within_budget'] and not saturated:
+            capacity = num_cameras
+        else:
+            saturated = True
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'cpu_count': os.cpu_count(),
+        'duration': duration,
+        'latency_budget_ms': latency_budget_ms,
+        'min_fps_ratio': min_fps_ratio,
+        'capacity': capacity,
+        'scenarios': scenarios
+    }
@@ -0,0 +1,116 @@
+import cv2
+import threading
+import time
+from utils.detection import create_face_models, detect_faces
+from utils.motion import MotionGate
+from utils.tracing import tracer
+from utils.tracking import MIN_CONFIDENCE_FRAMES, update_tracks
+
+class CameraStream:
+    def __init__(self, stream_source, camera_id, scheduler=None, target_fps=15.0, priority=1.0,
+                 motion_threshold=0.01):
+        self.stream_source = stream_source
+        self.camera_id = camera_id
+        self.scheduler = scheduler
+        self.target_fps = target_fps
+        self.priority = priority
+        self.motion_gate = MotionGate(min_changed_ratio=motion_threshold) if motion_threshold is not None else None
+        self.stream = None
+        self.stop_event = threading.Event()
+        self.thread_read = None
+        self.thread_detect = None
+        self.latest_frame = [None]
+        self.frame_lock = threading.Lock()
+        self.latest_result = [None]
+        self.result_lock = threading.Lock()
+        self.tracked_faces = {}
+        self.face_id_counter = 0
+        self.frame_count = 0
+        self.start_time = time.time()
+        self.init_complete = threading.Event()
+
+        self.yunet, self.recognizer_net = create_face_models()
+
+    def start(self):
+        # Nguồn có sẵn read() (video lặp, frame giả lập khi benchmark) được dùng trực tiếp
+        if hasattr(self.stream_source, 'read'):
+            self.stream = self.stream_source
+        else:
+            self.stream = cv2.VideoCapture(self.stream_source)
+        if not self.stream.isOpened():
+            print(f"Cannot open stream {self.stream_source}")
+            return False
+
+        self.stop_event.clear()
+        if self.motion_gate is not None:
+            # Nền cũ không còn đúng khi stream khởi động lại (camera có thể đã bị xoay, đổi ánh sáng)
+            self.motion_gate.reset()
+        if self.scheduler is not None:
+            self.scheduler.register(self.camera_id, self.target_fps, self.priority)
+        self.thread_read = threading.Thread(
+            target=self.read_frames,
+            name=f"capture-{self.camera_id}",
+            args=(self.stream, self.latest_frame, self.frame_lock, self.stop_event)
+        )
+        self.thread_detect = threading.Thread(
+            target=detect_faces,
+            name=f"detect-{self.camera_id}",
+            args=(self.latest_frame, self.frame_lock, self.latest_result,
+                  self.result_lock, self.stop_event, self.yunet, self.recognizer_net,
+                  self.scheduler, self.camera_id, self.motion_gate)
+        )
+
+        self.thread_read.start()
+        self.init_complete.set()
+        self.thread_detect.start()
+        return True
+
+    def read_frames(self, stream, latest_frame, frame_lock, stop_event):
+        while not stop_event.is_set():
+            capture_start = time.perf_counter_ns()
+            ret, frame = stream.read()
+            if not ret:
+                break
+            self.frame_count += 1
+            lock_start = time.perf_counter_ns()
+            with frame_lock:
+                latest_frame[0] = (frame.copy(), self.frame_count, time.time())
+            tracer.add_capture_span(self.camera_id, self.frame_count, 'capture', capture_start, lock_start)
+            tracer.add_capture_span(self.camera_id, self.frame_count, 'frame_lock', lock_start,
+                                    time.perf_counter_ns())
+
+    def apply_detections(self, detections, current_time):
+        # Dùng chung cho giao diện và benchmark: cập nhật track rồi đếm người quen/người lạ đã xác nhận
+        with tracer.span('tracking'):
+            self.tracked_faces, self.face_id_counter = update_tracks(
+                self.tracked_faces, detections, self.face_id_counter, current_time
+            )
+        if self.motion_gate is not None:
+            self.motion_gate.active_tracks = len(self.tracked_faces) > 0
+
+        known_names = set()
+        num_unknown = 0
+        for tracked_face in self.tracked_faces.values():
+            if tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES:
+                if tracked_face.recognized:
+                    known_names.add(tracked_face.name)
+                else:
+                    num_unknown += 1
+        return known_names, num_unknown
+
+    def stop(self):
+        if self.stop_event:
+            self.stop_event.set()
+        if self.thread_read:
+            self.thread_read.join()
+        if self.thread_detect:
+            self.thread_detect.join()
+        if self.stream:
+            self.stream.release()
+        if self.scheduler is not None:
+            self.scheduler.unregister(self.camera_id)
+
+        self.stop_event = threading.Event()
+        self.thread_read = None
+        self.thread_detect = None
+        self.stream = None
@@ -2,7 +2,10 @@ import cv2
 import numpy as np
 import faiss
 import os
+import time
 from utils.alignment import align_face
+from utils.identity_cache import identity_cache
+from utils.tracing import tracer
 
 class FaceRecognitionData:
     def __init__(self):
@@ -12,21 +15,72 @@ class FaceRecognitionData:
 
 face_recognition_data = FaceRecognitionData()
 
-def load_face_recognition():
-    face_recognition_data.known_embeddings = []
-    face_recognition_data.known_names = []
-    face_folder = 'face'
+# faiss.IndexFlatL2 trả về bình phương khoảng cách L2
+RECOGNITION_THRESHOLD = 1.05
+RECOGNITION_TOP_K = 3
 
+def create_face_models(score_threshold=0.6):
     yunet = cv2.FaceDetectorYN.create(
         model="model/yunet.onnx",
         config="",
         input_size=(160, 160),
-        score_threshold=0.65,
+        score_threshold=score_threshold,
         nms_threshold=0.4,
         top_k=50
     )
-
     recognizer_net = cv2.dnn.readNetFromONNX('model/mobilefacenet.onnx')
+    return yunet, recognizer_net
+
+def compute_embedding(img, landmarks, recognizer_net):
+    with tracer.span('alignment'):
+        aligned_face = align_face(img, landmarks)
+
+    with tracer.span('embedding'):
+        blob = cv2.dnn.blobFromImage(aligned_face,
+                                   scalefactor=1.0 / 127.5,
+                                   size=(112, 112),
+                                   mean=(127.5, 127.5, 127.5),
+                                   swapRB=True,
+                                   crop=False)
+
+        recognizer_net.setInput(blob)
+        face_embedding = recognizer_net.forward()
+        face_embedding = face_embedding / np.linalg.norm(face_embedding)
+    return face_embedding.flatten().astype('float32')
+
+def set_known_faces(known_embeddings, known_names):
+    identity_cache.clear()
+    face_recognition_data.known_embeddings = list(known_embeddings)
+    face_recognition_data.known_names = list(known_names)
+    face_recognition_data.index.reset()
+    if len(face_recognition_data.known_embeddings) > 0:
+        known_embeddings_np = np.vstack(face_recognition_data.known_embeddings).astype('float32')
+        face_recognition_data.index.add(known_embeddings_np)
+        return True
+    return False
+
+def embed_image(img_path, yunet, recognizer_net):
+    img = cv2.imread(img_path)
+    if img is None:
+        print(f"Cannot read image {img_path}")
+        return None
+
+    yunet.setInputSize((img.shape[1], img.shape[0]))
+    _, faces = yunet.detect(img)
+
+    if faces is None or len(faces) == 0:
+        return None
+
+    face = faces[0]
+    landmarks = face[4:14].reshape((5, 2))
+    return compute_embedding(img, landmarks, recognizer_net)
+
+def load_face_recognition():
+    face_folder = 'face'
+    known_embeddings = []
+    known_names = []
+
+    yunet, recognizer_net = create_face_models(score_threshold=0.65)
 
     if os.path.exists(face_folder):
         for person_name in os.listdir(face_folder):
@@ -36,128 +90,145 @@ def load_face_recognition():
                 for filename in os.listdir(person_folder):
                     if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
                         img_path = os.path.join(person_folder, filename)
-                        img = cv2.imread(img_path)
-                        if img is None:
-                            print(f"Cannot read image {img_path}")
-                            continue
-
-                        yunet.setInputSize((img.shape[1], img.shape[0]))
-                        _, faces = yunet.detect(img)
-
-                        if faces is not None and len(faces) > 0:
-                            face = faces[0]
-                            landmarks = face[4:14].reshape((5, 2))
-
-                            aligned_face = align_face(img, landmarks)
-                            blob = cv2.dnn.blobFromImage(aligned_face,
-                                                       scalefactor=1.0 / 127.5,
-                                                       size=(112, 112),
-                                                       mean=(127.5, 127.5, 127.5),
-                                                       swapRB=True,
-                                                       crop=False)
-
-                            recognizer_net.setInput(blob)
-                            face_embedding = recognizer_net.forward()
-                            face_embedding = face_embedding / np.linalg.norm(face_embedding)
-                            face_embedding = face_embedding.flatten()
-
+                        face_embedding = embed_image(img_path, yunet, recognizer_net)
+                        if face_embedding is not None:
                             person_embeddings.append(face_embedding)
 
                 if len(person_embeddings) > 0:
                     avg_embedding = np.mean(person_embeddings, axis=0)
-                    face_recognition_data.known_embeddings.append(avg_embedding)
-                    face_recognition_data.known_names.append(person_name)
+                    known_embeddings.append(avg_embedding)
+                    known_names.append(person_name)
 
-    if len(face_recognition_data.known_embeddings) > 0:
-        known_embeddings_np = np.vstack(face_recognition_data.known_embeddings).astype('float32')
-        face_recognition_data.index.reset()
-        face_recognition_data.index.add(known_embeddings_np)
-        return True
-    return False
+    return set_known_faces(known_embeddings, known_names)
 
-def detect_faces(latest_frame, frame_lock, latest_result, result_lock, stop_event, yunet, recognizer_net):
-    while not stop_event.is_set():
-        with frame_lock:
-            if latest_frame[0] is None:
-                continue
-            frame = latest_frame[0].copy()
-        
-        # Chuyển sang HSV để phân tích điều kiện ánh sáng
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        _, _, v = cv2.split(hsv)
-        
-        # Tính histogram của kênh Value để đánh giá điều kiện ánh sáng
-        hist = cv2.calcHist([v], [0], None, [256], [0, 256])
-        mean_brightness = np.mean(v)
-        std_brightness = np.std(v)
-        
-        # Chỉ áp dụng equalization nếu:
-        # - Độ sáng trung bình thấp (< 85) hoặc
-        # - Độ tương phản kém (std < 30)
-        if mean_brightness < 85 or std_brightness < 30:
-            equalized_v = cv2.equalizeHist(v)
-            hsv[:,:,2] = equalized_v
-            frame = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+def recognize_embedding(face_embedding):
+    if len(face_recognition_data.known_embeddings) == 0:
+        return 'unknown', False
+
+    D, I = face_recognition_data.index.search(face_embedding.reshape(1, -1), k=RECOGNITION_TOP_K)
+
+    counts = {}
+    for idx in I[0]:
+        if idx < 0:
+            continue
+        name = face_recognition_data.known_names[idx]
+        counts[name] = counts.get(name, 0) + 1
+
+    name = max(counts, key=counts.get)
+
+    avg_distance = np.mean(D[0][np.where(np.array(I[0]) == face_recognition_data.known_names.index(name))])
+
+    if avg_distance < RECOGNITION_THRESHOLD:
+        return name, True
+    return 'unknown', False
+
+def enhance_lighting(frame):
+    # Chuyển sang HSV để phân tích điều kiện ánh sáng
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    _, _, v = cv2.split(hsv)
+
+    mean_brightness = np.mean(v)
+    std_brightness = np.std(v)
 
+    # Chỉ áp dụng equalization nếu:
+    # - Độ sáng trung bình thấp (< 85) hoặc
+    # - Độ tương phản kém (std < 30)
+    if mean_brightness < 85 or std_brightness < 30:
+        equalized_v = cv2.equalizeHist(v)
+        hsv[:,:,2] = equalized_v
+        frame = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    return frame
+
+def process_frame(frame, yunet, recognizer_net, cache=None):
+    with tracer.span('preprocessing'):
+        frame = enhance_lighting(frame)
         small_frame = cv2.resize(frame, (160, 160))
+
+    with tracer.span('detection'):
         height, width, _ = small_frame.shape
         yunet.setInputSize((width, height))
         _, faces = yunet.detect(small_frame)
 
-        detections = []
-        if faces is not None:
-            for face in faces:
-                bbox = face[:4]
-                landmarks = face[4:14].reshape((5, 2))
-
-                scale_x = frame.shape[1] / width
-                scale_y = frame.shape[0] / height
-                bbox_scaled = bbox * [scale_x, scale_y, scale_x, scale_y]
-                bbox_scaled = bbox_scaled.astype(np.int32)
-                landmarks[:, 0] *= scale_x
-                landmarks[:, 1] *= scale_y
-
-                aligned_face = align_face(frame, landmarks)
-                blob = cv2.dnn.blobFromImage(aligned_face,
-                                           scalefactor=1.0 / 127.5,
-                                           size=(112, 112),
-                                           mean=(127.5, 127.5, 127.5),
-                                           swapRB=True,
-                                           crop=False)
-
-                recognizer_net.setInput(blob)
-                face_embedding = recognizer_net.forward()
-                face_embedding = face_embedding / np.linalg.norm(face_embedding)
-                face_embedding = face_embedding.flatten().astype('float32')
-
-                if len(face_recognition_data.known_embeddings) > 0:
-                    k = 3
-                    D, I = face_recognition_data.index.search(face_embedding.reshape(1, -1), k=k)
-
-                    counts = {}
-                    for idx in I[0]:
-                        name = face_recognition_data.known_names[idx]
-                        counts[name] = counts.get(name, 0) + 1
-
-                    name = max(counts, key=counts.get)
-
-                    avg_distance = np.mean(D[0][np.where(np.array(I[0]) == face_recognition_data.known_names.index(name))])
-
-                    threshold = 1.05
-                    if avg_distance < threshold:
-                        recognized = True
-                    else:
-                        name = 'unknown'
-                        recognized = False
-
+    detections = []
+    current_time = time.time()
+    if faces is not None:
+        scale_x = frame.shape[1] / width
+        scale_y = frame.shape[0] / height
+        for face in faces:
+            bbox = face[:4]
+            landmarks = face[4:14].reshape((5, 2))
+
+            bbox_scaled = bbox * [scale_x, scale_y, scale_x, scale_y]
+            bbox_scaled = bbox_scaled.astype(np.int32)
+            landmarks[:, 0] *= scale_x
+            landmarks[:, 1] *= scale_y
+
+            face_embedding = compute_embedding(frame, landmarks, recognizer_net)
+
+            with tracer.span('search'):
+                # Thử cache các track gần đây (dùng chung giữa các camera) trước khi tìm trong toàn bộ index
+                cached_name = cache.lookup(face_embedding, current_time) if cache is not None else None
+                if cached_name is not None:
+                    name, recognized = cached_name, True
                 else:
-                    name = 'unknown'
-                    recognized = False
+                    name, recognized = recognize_embedding(face_embedding)
+                    if recognized and cache is not None:
+                        cache.add(face_embedding, name, current_time)
+
+            detections.append({'bbox': bbox_scaled, 'name': name, 'recognized': recognized,
+                               'embedding': face_embedding, 'cached': cached_name is not None,
+                               'score': float(face[14])})
+
+    return frame, detections
+
+def detect_faces(latest_frame, frame_lock, latest_result, result_lock, stop_event, yunet, recognizer_net,
+                 scheduler=None, camera_id=None, motion_gate=None):
+    last_seq = None
+    while not stop_event.is_set():
+        wait_start = time.perf_counter_ns()
+        if scheduler is not None and not scheduler.wait_turn(camera_id, stop_event):
+            break
+
+        read_start = time.perf_counter_ns()
+        with frame_lock:
+            if latest_frame[0] is not None and latest_frame[0][1] != last_seq:
+                frame, seq, capture_time = latest_frame[0]
+                frame = frame.copy()
+            else:
+                frame = None
+        if frame is None:
+            # Chưa có frame mới từ camera thì không xử lý lại frame cũ
+            if scheduler is not None:
+                scheduler.cancel(camera_id, reschedule=True)
+            stop_event.wait(0.005)
+            continue
+        last_seq = seq
+
+        tracer.sample(camera_id, seq)
+        tracer.bind(camera_id, seq)
+        if scheduler is not None:
+            tracer.add_span('schedule', wait_start, read_start)
+        tracer.add_span('frame_lock', read_start, time.perf_counter_ns())
+
+        if motion_gate is not None:
+            with tracer.span('motion_gate'):
+                has_motion = motion_gate.should_process(frame)
+            if not has_motion:
+                # Khung hình tĩnh: không chạy detect nhưng vẫn gửi frame để hiển thị
+                if scheduler is not None:
+                    scheduler.cancel(camera_id)
+                with result_lock:
+                    latest_result[0] = (frame, [], seq, capture_time)
+                continue
 
-                detections.append({'bbox': bbox_scaled, 'name': name, 'recognized': recognized})
+        start_time = time.perf_counter()
+        frame, detections = process_frame(frame, yunet, recognizer_net, identity_cache)
+        if scheduler is not None:
+            scheduler.finish(camera_id, time.perf_counter() - start_time, len(detections) > 0)
 
-        with result_lock:
-            latest_result[0] = (frame, detections)
+        with tracer.span('result_lock'):
+            with result_lock:
+                latest_result[0] = (frame, detections, seq, capture_time)
 
 def draw_detections(frame, tracked_faces):
     for tracked_face in tracked_faces.values():
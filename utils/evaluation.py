@@ -0,0 +1,224 @@
+import os
+import time
+import numpy as np
+import faiss
+from utils.detection import create_face_models, embed_image, RECOGNITION_THRESHOLD, RECOGNITION_TOP_K
+
+# Embedding đã chuẩn hoá nên bình phương khoảng cách L2 nằm trong [0, 4]
+MAX_DISTANCE = 4.0
+HISTOGRAM_BINS = 4000
+BLOCK_ELEMENTS = 1 << 24
+
+def embed_folder(face_folder, cache_path=None):
+    if cache_path and os.path.exists(cache_path):
+        data = np.load(cache_path, allow_pickle=False)
+        return data['embeddings'], data['labels'], data['paths']
+
+    yunet, recognizer_net = create_face_models(score_threshold=0.65)
+
+    embeddings = []
+    labels = []
+    paths = []
+    for person_name in sorted(os.listdir(face_folder)):
+        person_folder = os.path.join(face_folder, person_name)
+        if not os.path.isdir(person_folder):
+            continue
+        for filename in sorted(os.listdir(person_folder)):
+            if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                continue
+            img_path = os.path.join(person_folder, filename)
+            face_embedding = embed_image(img_path, yunet, recognizer_net)
+            if face_embedding is not None:
+                embeddings.append(face_embedding)
+                labels.append(person_name)
+                paths.append(img_path)
+
+    embeddings = np.vstack(embeddings).astype('float32') if embeddings else np.zeros((0, 128), dtype='float32')
+    labels = np.array(labels)
+    paths = np.array(paths)
+
+    if cache_path:
+        np.savez_compressed(cache_path, embeddings=embeddings, labels=labels, paths=paths)
+    return embeddings, labels, paths
+
+def pair_distance_histograms(embeddings, labels):
+    _, label_ids = np.unique(labels, return_inverse=True)
+    n = len(embeddings)
+    genuine = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    impostor = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+    block_rows = max(1, BLOCK_ELEMENTS // max(1, n))
+    columns = np.arange(n)
+
+    # Tính theo từng khối hàng để không phải giữ cả ma trận n x n trong bộ nhớ
+    for start in range(0, n, block_rows):
+        end = min(start + block_rows, n)
+        similarities = embeddings[start:end] @ embeddings.T
+        distances = np.clip(2.0 - 2.0 * similarities, 0.0, MAX_DISTANCE)
+        bins = np.minimum((distances * (HISTOGRAM_BINS / MAX_DISTANCE)).astype(np.int64), HISTOGRAM_BINS - 1)
+
+        upper = columns[None, :] > np.arange(start, end)[:, None]
+        same = label_ids[start:end, None] == label_ids[None, :]
+
+        genuine += np.bincount(bins[upper & same], minlength=HISTOGRAM_BINS)
+        impostor += np.bincount(bins[upper & ~same], minlength=HISTOGRAM_BINS)
+
+    return genuine, impostor
+
+def verification_curve(genuine, impostor):
+    thresholds = np.arange(1, HISTOGRAM_BINS + 1) * (MAX_DISTANCE / HISTOGRAM_BINS)
+    genuine_total = max(1, genuine.sum())
+    impostor_total = max(1, impostor.sum())
+    # Cặp được chấp nhận khi khoảng cách < ngưỡng, giống detect_faces
+    far = np.cumsum(impostor) / impostor_total
+    frr = 1.0 - np.cumsum(genuine) / genuine_total
+
+    eer_index = int(np.argmin(np.abs(far - frr)))
+    return {
+        'thresholds': thresholds,
+        'far': far,
+        'frr': frr,
+        'eer': float((far[eer_index] + frr[eer_index]) / 2),
+        'eer_threshold': float(thresholds[eer_index])
+    }
+
+def rate_at(curve, threshold):
+    index = min(int(np.searchsorted(curve['thresholds'], threshold)), HISTOGRAM_BINS - 1)
+    return float(curve['far'][index]), float(curve['frr'][index])
+
+def split_gallery(labels, gallery_fraction=0.5, unknown_fraction=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    identities = np.unique(labels)
+    unknown = set(rng.choice(identities, size=int(len(identities) * unknown_fraction), replace=False))
+
+    gallery_mask = np.zeros(len(labels), dtype=bool)
+    for identity in identities:
+        if identity in unknown:
+            continue
+        members = np.flatnonzero(labels == identity)
+        rng.shuffle(members)
+        count = max(1, int(round(len(members) * gallery_fraction)))
+        if len(members) > 1:
+            count = min(count, len(members) - 1)
+        gallery_mask[members[:count]] = True
+
+    probe_known = ~gallery_mask & ~np.isin(labels, list(unknown))
+    probe_unknown = np.isin(labels, list(unknown))
+    return gallery_mask, probe_known | probe_unknown, probe_unknown
+
+def build_templates(embeddings, labels, mode):
+    if mode == 'per-image':
+        return embeddings, labels
+    names, label_ids = np.unique(labels, return_inverse=True)
+    sums = np.zeros((len(names), embeddings.shape[1]), dtype=np.float64)
+    np.add.at(sums, label_ids, embeddings)
+    counts = np.bincount(label_ids, minlength=len(names))[:, None]
+    # Giống load_face_recognition: trung bình embedding, không chuẩn hoá lại
+    return (sums / counts).astype('float32'), names
+
+def vote(distances, indices, template_labels):
+    k = indices.shape[1]
+    neighbour_labels = template_labels[np.maximum(indices, 0)]
+    valid = indices >= 0
+
+    # Số phiếu của nhãn ở từng vị trí; hoà thì lấy nhãn xuất hiện trước, giống max() trên dict
+    votes = np.zeros(indices.shape, dtype=np.int64)
+    for j in range(k):
+        votes += (neighbour_labels == neighbour_labels[:, j:j + 1]) & valid[:, j:j + 1]
+    votes[~valid] = -1
+    winner_position = np.argmax(votes, axis=1)
+    winners = neighbour_labels[np.arange(len(indices)), winner_position]
+
+    winner_mask = (neighbour_labels == winners[:, None]) & valid
+    avg_distance = (distances * winner_mask).sum(axis=1) / np.maximum(1, winner_mask.sum(axis=1))
+    return winners, avg_distance
+
+def identification_curve(winners, avg_distance, probe_labels, probe_unknown, thresholds):
+    correct = (winners == probe_labels) & ~probe_unknown
+    known_total = max(1, int((~probe_unknown).sum()))
+    unknown_total = max(1, int(probe_unknown.sum()))
+
+    correct_distances = np.sort(avg_distance[correct])
+    wrong_known_distances = np.sort(avg_distance[~correct & ~probe_unknown])
+    unknown_distances = np.sort(avg_distance[probe_unknown])
+
+    # searchsorted side='left' đếm các probe có khoảng cách < ngưỡng
+    return {
+        'thresholds': thresholds,
+        'detect_identify_rate': np.searchsorted(correct_distances, thresholds) / known_total,
+        'misidentify_rate': np.searchsorted(wrong_known_distances, thresholds) / known_total,
+        'false_accept_rate': np.searchsorted(unknown_distances, thresholds) / unknown_total
+    }
+
+def evaluate_templates(embeddings, labels, gallery_mask, probe_mask, probe_unknown, mode, thresholds):
+    templates, template_labels = build_templates(embeddings[gallery_mask], labels[gallery_mask], mode)
+    index = faiss.IndexFlatL2(templates.shape[1])
+    index.add(templates)
+
+    probes = embeddings[probe_mask]
+    start = time.perf_counter()
+    distances, indices = index.search(probes, RECOGNITION_TOP_K)
+    search_seconds = time.perf_counter() - start
+
+    winners, avg_distance = vote(distances, indices, template_labels)
+    curve = identification_curve(winners, avg_distance, labels[probe_mask], probe_unknown[probe_mask], thresholds)
+    curve['templates'] = len(templates)
+    curve['search_us_per_query'] = 1e6 * search_seconds / max(1, len(probes))
+    return curve
+
+def gallery_scaling(embeddings, labels, sizes, probes_per_size=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        if size >= len(embeddings):
+            break
+        order = rng.permutation(len(embeddings))
+        gallery = order[:size]
+        probes = order[size:size + probes_per_size]
+
+        index = faiss.IndexFlatL2(embeddings.shape[1])
+        index.add(embeddings[gallery])
+
+        # Ứng dụng tìm từng khuôn mặt một nên đo theo từng truy vấn
+        start = time.perf_counter()
+        for probe in probes:
+            index.search(embeddings[probe:probe + 1], 1)
+        single_seconds = time.perf_counter() - start
+
+        distances, indices = index.search(embeddings[probes], 1)
+        gallery_labels = labels[gallery]
+        in_gallery = np.isin(labels[probes], gallery_labels)
+        hit = (gallery_labels[indices[:, 0]] == labels[probes]) & in_gallery
+
+        results.append({
+            'gallery_size': int(size),
+            'search_us_per_query': 1e6 * single_seconds / max(1, len(probes)),
+            'rank1_accuracy': float(hit.sum() / max(1, in_gallery.sum()))
+        })
+    return results
+
+def run_evaluation(face_folder, cache_path=None, gallery_sizes=(100, 1000, 10000, 100000), seed=0):
+    embeddings, labels, _ = embed_folder(face_folder, cache_path)
+    if len(embeddings) < 2:
+        raise ValueError(f"Need at least two embedded images in {face_folder}")
+
+    genuine, impostor = pair_distance_histograms(embeddings, labels)
+    verification = verification_curve(genuine, impostor)
+    far, frr = rate_at(verification, RECOGNITION_THRESHOLD)
+
+    thresholds = verification['thresholds']
+    gallery_mask, probe_mask, probe_unknown = split_gallery(labels, seed=seed)
+    identification = {
+        mode: evaluate_templates(embeddings, labels, gallery_mask, probe_mask, probe_unknown, mode, thresholds)
+        for mode in ('average', 'per-image')
+    }
+
+    return {
+        'images': int(len(embeddings)),
+        'identities': int(len(np.unique(labels))),
+        'genuine_pairs': int(genuine.sum()),
+        'impostor_pairs': int(impostor.sum()),
+        'verification': verification,
+        'current_threshold': {'threshold': RECOGNITION_THRESHOLD, 'far': far, 'frr': frr},
+        'identification': identification,
+        'scaling': gallery_scaling(embeddings, labels, gallery_sizes, seed=seed)
+    }
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from utils.tracking import MIN_CONFIDENCE_FRAMES
+
+class Subscriber:
+    def __init__(self, camera_ids, event_types, queue_size, max_lag_drops):
+        self.camera_ids = camera_ids
+        self.event_types = event_types
+        self.queue = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.sent = 0
+        # Tổng số sự kiện bị bỏ chỉ để báo cáo; ngắt kết nối dựa trên các lần bỏ gần đây
+        self.dropped = 0
+        self.drop_times = deque(maxlen=max_lag_drops + 1)
+
+    def wants(self, event):
+        if self.camera_ids and event['camera_id'] not in self.camera_ids:
+            return False
+        return not self.event_types or event['type'] in self.event_types
+
+    def is_lagging(self, current_time, window):
+        # Bỏ quá max_lag_drops sự kiện trong window giây: client không theo kịp, khác với vài lần nghẽn ngắn
+        return (len(self.drop_times) == self.drop_times.maxlen and
+                current_time - self.drop_times[0] <= window)
+
+    def offer(self, payload):
+        # Hàng đợi đầy thì bỏ sự kiện cũ nhất: client chậm chỉ nhận ít sự kiện hơn, không làm chậm pipeline
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+            self.drop_times.append(time.time())
+        self.queue.append(payload)
+        self.ready.set()
+
+class EventServer:
+    def __init__(self, host='127.0.0.1', port=8765, queue_size=100, max_lag_drops=500,
+                 lag_window=30.0, write_timeout=5.0, heartbeat_interval=15.0):
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.max_lag_drops = max_lag_drops
+        self.lag_window = lag_window
+        self.write_timeout = write_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.subscribers = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+        self.published = 0
+
+    def start(self):
+        if self.thread is not None:
+            return self.server is not None
+        self.started.clear()
+        self.thread = threading.Thread(target=self._run, name="event-server", daemon=True)
+        self.thread.start()
+        self.started.wait(5.0)
+        return self.server is not None
+
+    def stop(self):
+        if self.loop is not None and self.thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.loop = None
+        self.thread = None
+        self.server = None
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port))
+        except OSError as e:
+            print(f"Cannot start event server on {self.host}:{self.port}: {str(e)}")
+            self.started.set()
+            return
+
+        print(f"Event server listening on http://{self.host}:{self.port}/events")
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def publish(self, event_type, camera_id, data):
+        # Gọi từ thread pipeline: bỏ qua ngay khi không có ai đăng ký
+        if self.loop is None or not self.subscribers:
+            return
+        event = {'type': event_type, 'camera_id': camera_id, 'time': time.time(), 'data': data}
+        self.loop.call_soon_threadsafe(self._broadcast, event)
+
+    def _broadcast(self, event):
+        self.published += 1
+        payload = None
+        for subscriber in self.subscribers:
+            if not subscriber.wants(event):
+                continue
+            if payload is None:
+                payload = f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+            subscriber.offer(payload)
+
+    async def _handle_client(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=10.0)
+            method, target, _ = request.split(b'\r\n', 1)[0].decode('latin-1').split(' ', 2)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+
+        url = urlsplit(target)
+        if method != 'GET':
+            await self._respond(writer, '405 Method Not Allowed', 'text/plain', b'Method not allowed\n')
+        elif url.path == '/events':
+            await self._stream_events(writer, parse_qs(url.query))
+        elif url.path == '/health':
+            body = json.dumps(self.stats()).encode()
+            await self._respond(writer, '200 OK', 'application/json', body)
+        else:
+            await self._respond(writer, '404 Not Found', 'text/plain', b'Not found\n')
+
+    async def _respond(self, writer, status, content_type, body):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        try:
+            await asyncio.wait_for(writer.drain(), timeout=self.write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        writer.close()
+
+    async def _stream_events(self, writer, query):
+        camera_ids = {int(value) for values in query.get('camera', []) for value in values.split(',') if value.isdigit()}
+        event_types = {value for values in query.get('type', []) for value in values.split(',') if value}
+        subscriber = Subscriber(camera_ids, event_types, self.queue_size, self.max_lag_drops)
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nAccess-Control-Allow-Origin: *\r\n"
+                     b"Connection: keep-alive\r\n\r\n")
+        self.subscribers.add(subscriber)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")
+                subscriber.ready.clear()
+
+                while subscriber.queue:
+                    writer.write(subscriber.queue.popleft())
+                    subscriber.sent += 1
+
+                # Client không đọc kịp trong write_timeout hoặc đang bị bỏ nhiều sự kiện liên tục thì ngắt kết nối
+                await asyncio.wait_for(writer.drain(), timeout=self.write_timeout)
+                if subscriber.is_lagging(time.time(), self.lag_window):
+                    break
+        except (asyncio.TimeoutError, asyncio.CancelledError, ConnectionError):
+            # CancelledError khi server dừng
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            writer.close()
+
+    def stats(self):
+        return {
+            'published': self.published,
+            'subscribers': [{
+                'cameras': sorted(subscriber.camera_ids),
+                'types': sorted(subscriber.event_types),
+                'queued': len(subscriber.queue),
+                'sent': subscriber.sent,
+                'dropped': subscriber.dropped
+            } for subscriber in list(self.subscribers)]
+        }
+
+def snapshot_tracks(tracked_faces):
+    return {face_id: (tracked_face.name, tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES)
+            for face_id, tracked_face in tracked_faces.items()}
+
+def track_events(before, tracked_faces):
+    events = []
+    for face_id, tracked_face in tracked_faces.items():
+        confirmed = tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES
+        data = {'track_id': face_id, 'name': tracked_face.name, 'recognized': tracked_face.recognized}
+        if face_id not in before:
+            events.append(('new', data))
+        elif confirmed and not before[face_id][1]:
+            events.append(('confirmed', data))
+        elif before[face_id][0] != tracked_face.name:
+            events.append(('identity', data))
+    for face_id, (name, _) in before.items():
+        if face_id not in tracked_faces:
+            events.append(('lost', {'track_id': face_id, 'name': name}))
+    return events
+
+def track_payload(tracked_faces):
+    return [{
+        'track_id': face_id,
+        'name': tracked_face.name,
+        'recognized': tracked_face.recognized,
+        'confirmed': tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES,
+        'bbox': [int(v) for v in tracked_face.bbox]
+    } for face_id, tracked_face in tracked_faces.items()]
@@ -0,0 +1,71 @@
+import threading
+import numpy as np
+
+class IdentityCache:
+    def __init__(self, max_entries=256, ttl=30.0, max_age=120.0, threshold=0.6, dim=128):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Thời gian tối đa kể từ lần cuối được xác nhận với thư viện khuôn mặt, dù vẫn liên tục được dùng
+        self.max_age = max_age
+        # Ngưỡng (bình phương L2) chặt hơn ngưỡng nhận diện để tránh gán nhầm người
+        self.threshold = threshold
+        self.embeddings = np.zeros((max_entries, dim), dtype='float32')
+        self.names = [None] * max_entries
+        self.last_seen = np.full(max_entries, -np.inf)
+        self.confirmed_at = np.full(max_entries, -np.inf)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _alive(self, current_time):
+        return ((self.last_seen >= current_time - self.ttl) &
+                (self.confirmed_at >= current_time - self.max_age))
+
+    def _nearest(self, embedding, current_time):
+        alive = self._alive(current_time)
+        if not alive.any():
+            return None, None
+        # Embedding đã chuẩn hoá nên |a - b|^2 = 2 - 2 a.b
+        distances = 2.0 - 2.0 * (self.embeddings @ embedding)
+        distances[~alive] = np.inf
+        slot = int(np.argmin(distances))
+        return slot, float(distances[slot])
+
+    def lookup(self, embedding, current_time):
+        with self.lock:
+            slot, distance = self._nearest(embedding, current_time)
+            if slot is None or distance >= self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Giữ nguyên embedding đã xác nhận với thư viện để ô cache không trôi dần sang người khác
+            self.last_seen[slot] = current_time
+            return self.names[slot]
+
+    def add(self, embedding, name, current_time):
+        with self.lock:
+            slot, distance = self._nearest(embedding, current_time)
+            if slot is None or distance >= self.threshold or self.names[slot] != name:
+                # Ô trống hoặc hết hạn được dùng lại trước, sau đó đến ô lâu không được dùng nhất
+                slot = int(np.argmin(np.where(self._alive(current_time), self.last_seen, -np.inf)))
+            self.embeddings[slot] = embedding
+            self.names[slot] = name
+            self.last_seen[slot] = current_time
+            self.confirmed_at[slot] = current_time
+
+    def clear(self):
+        with self.lock:
+            self.names = [None] * self.max_entries
+            self.last_seen[:] = -np.inf
+            self.confirmed_at[:] = -np.inf
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total > 0 else 0.0
+            }
+
+identity_cache = IdentityCache()
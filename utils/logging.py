@@ -1,8 +1,8 @@
-from utils.database import supabase
-
 class FaceDetectionLogger:
-    def __init__(self):
-        self.supabase = supabase
+    def __init__(self, client=None):
+        if client is None:
+            from utils.database import supabase as client
+        self.supabase = client
         self.last_stranger_count = 0
         self.last_known_faces = set()
         self.min_update_interval = 2
@@ -0,0 +1,59 @@
+import threading
+import time
+import cv2
+import numpy as np
+
+class MotionGate:
+    def __init__(self, min_changed_ratio=0.01, pixel_threshold=25, size=(64, 48),
+                 background_alpha=0.05, max_skip_seconds=2.0):
+        # min_changed_ratio: tỉ lệ điểm ảnh thay đổi tối thiểu để coi là có chuyển động
+        self.min_changed_ratio = min_changed_ratio
+        self.pixel_threshold = pixel_threshold
+        self.size = size
+        self.background_alpha = background_alpha
+        self.max_skip_seconds = max_skip_seconds
+        self.background = None
+        self.active_tracks = False
+        self.last_processed_time = 0
+        self.frames = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def should_process(self, frame, current_time=None):
+        current_time = time.time() if current_time is None else current_time
+
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+        with self.lock:
+            self.frames += 1
+            if self.background is None:
+                self.background = gray.astype(np.float32)
+                self.last_processed_time = current_time
+                return True
+
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+            changed_ratio = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+            # Nền cập nhật chậm để ánh sáng thay đổi dần không bị tính là chuyển động
+            cv2.accumulateWeighted(gray, self.background, self.background_alpha)
+
+            # Vẫn chạy detect khi còn track đang theo dõi (người đứng yên) hoặc đã bỏ qua quá lâu
+            if (changed_ratio >= self.min_changed_ratio or self.active_tracks or
+                    current_time - self.last_processed_time >= self.max_skip_seconds):
+                self.last_processed_time = current_time
+                return True
+
+            self.skipped += 1
+            return False
+
+    def reset(self):
+        with self.lock:
+            self.background = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'frames': self.frames,
+                'skipped': self.skipped,
+                'skip_ratio': self.skipped / self.frames if self.frames > 0 else 0.0
+            }
@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_COST = 0.05
+COST_SMOOTHING = 0.2
+RATE_WINDOW = 5.0
+
+class CameraSchedule:
+    def __init__(self, camera_id, target_fps, weight, timestamp):
+        self.camera_id = camera_id
+        self.target_fps = target_fps
+        self.weight = weight
+        self.allotted_fps = target_fps
+        self.avg_cost = DEFAULT_COST
+        self.next_due = timestamp
+        self.last_faces_time = timestamp
+        self.completed = deque()
+        self.max_wait = 0.0
+        self.total_wait = 0.0
+        self.cycles = 0
+
+    def is_idle(self, current_time, idle_after):
+        return current_time - self.last_faces_time >= idle_after
+
+    def achieved_fps(self, current_time):
+        while self.completed and current_time - self.completed[0] > RATE_WINDOW:
+            self.completed.popleft()
+        window = min(RATE_WINDOW, max(1e-6, current_time - self.completed[0])) if self.completed else RATE_WINDOW
+        return len(self.completed) / window if len(self.completed) > 1 else 0.0
+
+class DetectionScheduler:
+    def __init__(self, max_concurrent=None, headroom=0.9, min_fps=1.0, idle_after=5.0, idle_weight=0.25,
+                 clock=time.time):
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self.headroom = headroom
+        self.min_fps = min_fps
+        self.idle_after = idle_after
+        self.idle_weight = idle_weight
+        self.clock = clock
+        self.cameras = {}
+        self.lock = threading.Lock()
+        self.slots = threading.Semaphore(self.max_concurrent)
+
+    def register(self, camera_id, target_fps=15.0, weight=1.0):
+        if not target_fps > 0 or not weight >= 0:
+            raise ValueError(f"Invalid schedule for camera {camera_id}: target_fps={target_fps}, weight={weight}")
+        with self.lock:
+            self.cameras[camera_id] = CameraSchedule(camera_id, target_fps, weight, self.clock())
+            self._rebalance(self.clock())
+
+    def unregister(self, camera_id):
+        with self.lock:
+            self.cameras.pop(camera_id, None)
+            self._rebalance(self.clock())
+
+    def _rebalance(self, current_time):
+        # Chia thời gian xử lý theo trọng số (water-filling): camera cần ít hơn phần được chia
+        # thì nhận đủ, phần dư chia tiếp cho các camera còn lại
+        capacity = self.max_concurrent * self.headroom
+        pending = {}
+        for camera in self.cameras.values():
+            weight = camera.weight
+            if camera.is_idle(current_time, self.idle_after):
+                weight *= self.idle_weight
+            pending[camera.camera_id] = (camera, weight, camera.target_fps * camera.avg_cost)
+
+        while pending:
+            total_weight = sum(weight for _, weight, _ in pending.values())
+            if total_weight <= 0:
+                # Toàn bộ camera còn lại có trọng số 0: chỉ giữ tốc độ tối thiểu
+                for camera, _, _ in pending.values():
+                    camera.allotted_fps = self.min_fps
+                break
+            satisfied = [camera_id for camera_id, (_, weight, demand) in pending.items()
+                         if demand <= capacity * weight / total_weight]
+            if not satisfied:
+                for camera, weight, _ in pending.values():
+                    share = capacity * weight / total_weight
+                    camera.allotted_fps = max(self.min_fps, share / camera.avg_cost)
+                break
+            for camera_id in satisfied:
+                camera, _, demand = pending.pop(camera_id)
+                camera.allotted_fps = camera.target_fps
+                capacity -= demand
+
+    def wait_turn(self, camera_id, stop_event):
+        with self.lock:
+            camera = self.cameras.get(camera_id)
+            if camera is None:
+                return False
+            delay = camera.next_due - self.clock()
+        if delay > 0 and stop_event.wait(delay):
+            return False
+
+        due = self.clock()
+        while not self.slots.acquire(timeout=0.1):
+            if stop_event.is_set():
+                return False
+
+        with self.lock:
+            camera = self.cameras.get(camera_id)
+            if camera is None:
+                self.slots.release()
+                return False
+            now = self.clock()
+            wait = now - due
+            camera.max_wait = max(camera.max_wait, wait)
+            camera.total_wait += wait
+            camera.next_due = now + 1.0 / camera.allotted_fps
+        return True
+
+    def cancel(self, camera_id, reschedule=False):
+        # reschedule=True khi lượt này không dùng được (chưa có frame mới): trả lại chu kỳ để thử lại ngay
+        self.slots.release()
+        if reschedule:
+            with self.lock:
+                camera = self.cameras.get(camera_id)
+                if camera is not None:
+                    camera.next_due = self.clock()
+
+    def finish(self, camera_id, cost, has_faces):
+        self.slots.release()
+        with self.lock:
+            camera = self.cameras.get(camera_id)
+            if camera is None:
+                return
+            now = self.clock()
+            camera.avg_cost += COST_SMOOTHING * (cost - camera.avg_cost)
+            camera.completed.append(now)
+            camera.cycles += 1
+            if has_faces:
+                camera.last_faces_time = now
+            self._rebalance(now)
+
+    def report(self):
+        with self.lock:
+            now = self.clock()
+            return [{
+                'camera_id': camera.camera_id,
+                'target_fps': camera.target_fps,
+                'allotted_fps': round(camera.allotted_fps, 2),
+                'achieved_fps': round(camera.achieved_fps(now), 2),
+                'weight': camera.weight,
+                'idle': camera.is_idle(now, self.idle_after),
+                'avg_cost_ms': round(camera.avg_cost * 1000, 1),
+                'avg_wait_ms': round(1000 * camera.total_wait / max(1, camera.cycles), 1),
+                'max_wait_ms': round(camera.max_wait * 1000, 1)
+            } for camera in self.cameras.values()]
+
+def simulate_load(cameras, duration=10.0, max_concurrent=2, **scheduler_options):
+    # cameras: danh sách (camera_id, target_fps, weight, cost_giây, có_mặt_người)
+    scheduler = DetectionScheduler(max_concurrent=max_concurrent, **scheduler_options)
+    stop_event = threading.Event()
+
+    def worker(camera_id, cost, has_faces):
+        while scheduler.wait_turn(camera_id, stop_event):
+            # time.sleep nhả GIL giống như khi OpenCV chạy mô hình
+            time.sleep(cost)
+            scheduler.finish(camera_id, cost, has_faces)
+
+    threads = []
+    for camera_id, target_fps, weight, cost, has_faces in cameras:
+        scheduler.register(camera_id, target_fps, weight)
+        threads.append(threading.Thread(target=worker, args=(camera_id, cost, has_faces)))
+    for thread in threads:
+        thread.start()
+
+    time.sleep(duration)
+    result = scheduler.report()
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    return result
+
+if __name__ == "__main__":
+    # Tải yêu cầu gấp ~2 lần khả năng xử lý: cửa chính ưu tiên cao, hai camera hành lang không có người
+    load = [
+        (1, 15.0, 4.0, 0.05, True),
+        (2, 15.0, 1.0, 0.05, True),
+        (3, 15.0, 1.0, 0.05, False),
+        (4, 15.0, 1.0, 0.05, False),
+    ]
+    for row in simulate_load(load, duration=10.0, max_concurrent=1):
+        print(row)
@@ -0,0 +1,195 @@
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from utils.tracking import MIN_CONFIDENCE_FRAMES
+
+class LocalSnapshotStorage:
+    def __init__(self, folder='snapshots'):
+        self.folder = folder
+
+    def upload(self, path, data):
+        local_path = os.path.join(self.folder, path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, 'wb') as f:
+            f.write(data)
+
+class SupabaseSnapshotStorage:
+    def __init__(self, bucket='stranger', client=None):
+        if client is None:
+            from utils.database import supabase as client
+        self.supabase = client
+        self.bucket = bucket
+
+    def upload(self, path, data):
+        self.supabase.storage.from_(self.bucket).upload(path, data, {"content-type": "image/jpeg"})
+
+class RateLimiter:
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self.capacity = max(1.0, per_minute / 6)
+        self.tokens = self.capacity
+        self.last_time = time.time()
+        self.lock = threading.Lock()
+
+    def wait(self, stop_event):
+        while not stop_event.is_set():
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_time) / self.interval)
+                self.last_time = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                delay = (1 - self.tokens) * self.interval
+            stop_event.wait(delay)
+        return False
+
+class SnapshotCandidate:
+    def __init__(self, camera_id, face_id, timestamp):
+        self.camera_id = camera_id
+        self.face_id = face_id
+        self.first_seen = timestamp
+        self.quality = 0
+        self.crop = None
+        self.embedding = None
+        self.submitted = False
+
+class StrangerSnapshots:
+    def __init__(self, storage, workers=2, max_pending=32, uploads_per_minute=30, jpeg_quality=90,
+                 dedup_threshold=0.8, dedup_ttl=600.0, max_recent=512, submit_after=5.0):
+        self.storage = storage
+        self.max_pending = max_pending
+        self.jpeg_quality = jpeg_quality
+        # Ngưỡng (bình phương L2) để coi hai lần xuất hiện là cùng một người lạ
+        self.dedup_threshold = dedup_threshold
+        self.dedup_ttl = dedup_ttl
+        # Người lạ đứng lâu trong khung hình vẫn được gửi ảnh sau submit_after giây
+        self.submit_after = submit_after
+        self.rate_limiter = RateLimiter(uploads_per_minute)
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.candidates = {}
+        self.recent_embeddings = np.zeros((max_recent, 128), dtype='float32')
+        self.recent_times = np.full(max_recent, -np.inf)
+        self.recent_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.counts = {'submitted': 0, 'dropped': 0, 'duplicates': 0, 'uploaded': 0, 'failed': 0}
+        self.counts_lock = threading.Lock()
+        self.workers = [threading.Thread(target=self._worker, name=f"snapshot-{index + 1}", daemon=True)
+                        for index in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def observe(self, camera_id, frame, tracked_faces, current_time):
+        # Chạy trên thread giao diện: chỉ so sánh điểm chất lượng và cắt ảnh khi tốt hơn, không mã hoá
+        for face_id, tracked_face in tracked_faces.items():
+            key = (camera_id, face_id)
+            if tracked_face.recognized:
+                self.candidates.pop(key, None)
+                continue
+            if tracked_face.confidence_count < MIN_CONFIDENCE_FRAMES or tracked_face.missing_count > 0:
+                continue
+
+            candidate = self.candidates.get(key)
+            if candidate is None:
+                candidate = self.candidates[key] = SnapshotCandidate(camera_id, face_id, current_time)
+            if candidate.submitted:
+                continue
+
+            x, y, w, h = [int(v) for v in tracked_face.bbox]
+            quality = w * h * tracked_face.score
+            if quality > candidate.quality and tracked_face.embedding is not None:
+                x1, y1 = max(0, x), max(0, y)
+                x2, y2 = min(frame.shape[1], x + w), min(frame.shape[0], y + h)
+                if x2 > x1 and y2 > y1:
+                    candidate.quality = quality
+                    candidate.crop = frame[y1:y2, x1:x2].copy()
+                    candidate.embedding = tracked_face.embedding
+
+            if current_time - candidate.first_seen >= self.submit_after:
+                self._submit(candidate)
+
+        for key in [key for key in self.candidates if key[0] == camera_id and key[1] not in tracked_faces]:
+            candidate = self.candidates.pop(key)
+            if not candidate.submitted:
+                self._submit(candidate)
+
+    def forget_camera(self, camera_id):
+        # Camera đã dừng: bỏ các ứng viên còn giữ ảnh cắt, id track sẽ được đánh lại khi camera chạy lại
+        for key in [key for key in self.candidates if key[0] == camera_id]:
+            del self.candidates[key]
+
+    def _count(self, name):
+        with self.counts_lock:
+            self.counts[name] += 1
+
+    def _submit(self, candidate):
+        candidate.submitted = True
+        if candidate.crop is None:
+            return
+        crop, embedding = candidate.crop, candidate.embedding
+        candidate.crop = None
+        try:
+            self.pending.put_nowait((candidate.camera_id, candidate.face_id, candidate.first_seen, crop, embedding))
+            self._count('submitted')
+        except queue.Full:
+            self._count('dropped')
+
+    def _reserve(self, embedding, current_time):
+        # Giữ chỗ trước khi tải lên để worker khác không gửi trùng cùng người; trả về None nếu trùng
+        with self.recent_lock:
+            alive = self.recent_times >= current_time - self.dedup_ttl
+            if alive.any():
+                distances = 2.0 - 2.0 * (self.recent_embeddings @ embedding)
+                distances[~alive] = np.inf
+                slot = int(np.argmin(distances))
+                if distances[slot] < self.dedup_threshold:
+                    self.recent_times[slot] = current_time
+                    return None
+            slot = int(np.argmin(self.recent_times))
+            self.recent_embeddings[slot] = embedding
+            self.recent_times[slot] = current_time
+            return slot
+
+    def _release(self, slot, embedding):
+        # Tải lên thất bại: bỏ giữ chỗ để lần xuất hiện sau của người này vẫn được gửi ảnh
+        with self.recent_lock:
+            if np.array_equal(self.recent_embeddings[slot], embedding):
+                self.recent_times[slot] = -np.inf
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            try:
+                camera_id, face_id, first_seen, crop, embedding = self.pending.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            slot = self._reserve(embedding, time.time())
+            if slot is None:
+                self._count('duplicates')
+                continue
+
+            ok, encoded = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if not ok or not self.rate_limiter.wait(self.stop_event):
+                self._release(slot, embedding)
+                continue
+
+            path = f"camera_{camera_id}/{time.strftime('%Y%m%d_%H%M%S', time.localtime(first_seen))}_{face_id}.jpg"
+            try:
+                self.storage.upload(path, encoded.tobytes())
+                self._count('uploaded')
+            except Exception as e:
+                print(f"Error uploading stranger snapshot: {str(e)}")
+                self._release(slot, embedding)
+                self._count('failed')
+
+    def stop(self):
+        self.stop_event.set()
+        for worker in self.workers:
+            worker.join()
+
+    def stats(self):
+        with self.counts_lock:
+            return dict(self.counts, pending=self.pending.qsize())
@@ -0,0 +1,75 @@
+import time
+import cv2
+import numpy as np
+
+class PacedCapture:
+    def __init__(self, fps):
+        self.fps = fps
+        self.next_frame_time = None
+        self.opened = True
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.opened = False
+
+    def wait_next_frame(self):
+        # Giữ đúng tốc độ khung hình như camera thật thay vì đọc nhanh hết mức
+        now = time.time()
+        if self.next_frame_time is None:
+            self.next_frame_time = now
+        delay = self.next_frame_time - now
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_time = max(self.next_frame_time + 1.0 / self.fps, now - 1.0 / self.fps)
+
+class LoopingVideoCapture(PacedCapture):
+    def __init__(self, path, fps=None):
+        self.capture = cv2.VideoCapture(path)
+        super().__init__(fps or self.capture.get(cv2.CAP_PROP_FPS) or 30.0)
+        self.opened = self.capture.isOpened()
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        self.wait_next_frame()
+        ret, frame = self.capture.read()
+        if not ret:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return ret, frame
+
+    def release(self):
+        super().release()
+        self.capture.release()
+
+class SyntheticCapture(PacedCapture):
+    def __init__(self, width=640, height=480, fps=30.0, face_image=None, seed=0):
+        super().__init__(fps)
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        self.background = cv2.GaussianBlur(self.background, (21, 21), 0)
+        self.face = None
+        if face_image is not None:
+            face = cv2.imread(face_image)
+            if face is None:
+                raise ValueError(f"Cannot read face image {face_image}")
+            size = min(height // 2, width // 2)
+            self.face = cv2.resize(face, (size, size))
+        self.position = int(rng.integers(0, width))
+        self.step = max(1, width // 90)
+
+    def read(self):
+        if not self.opened:
+            return False, None
+        self.wait_next_frame()
+        frame = self.background.copy()
+        if self.face is not None:
+            # Khuôn mặt di chuyển ngang qua khung hình rồi quay lại từ đầu
+            height, width, _ = frame.shape
+            size = self.face.shape[0]
+            self.position = (self.position + self.step) % (width - size)
+            top = (height - size) // 2
+            frame[top:top + size, self.position:self.position + size] = self.face
+        return True, frame
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, tracer, name, context):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.events.append((self.name, self.start_ns, time.perf_counter_ns(),
+                                   threading.get_ident(), self.context))
+        return False
+
+PENDING_CAPTURE_EVENTS = 64
+SAMPLED_FRAMES = 16
+
+class Tracer:
+    def __init__(self, max_events=200000):
+        self.enabled = False
+        self.sample_every = 1
+        self.events = deque(maxlen=max_events)
+        self.thread_names = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._handled = {}
+        self._sampled = {}
+        self._pending = {}
+
+    def start(self, sample_every=1):
+        self.events.clear()
+        self.thread_names = {}
+        self.sample_every = max(1, sample_every)
+        with self._lock:
+            self._handled = {}
+            self._sampled = {}
+            self._pending = {}
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def sample(self, camera_id, seq):
+        # Quyết định lấy mẫu theo số frame thread detect thực sự xử lý (không theo seq của camera),
+        # vì detect thường chạy chậm hơn capture và seq được xử lý có thể luôn cùng pha với N
+        if not self.enabled:
+            return False
+        with self._lock:
+            handled = self._handled.get(camera_id, 0)
+            self._handled[camera_id] = handled + 1
+            if handled % self.sample_every != 0:
+                return False
+            self._sampled.setdefault(camera_id, deque(maxlen=SAMPLED_FRAMES)).append(seq)
+            # Span capture của frame này đã được giữ tạm trước khi biết frame có được chọn hay không
+            pending = self._pending.get(camera_id, ())
+            self.events.extend(event for event in pending if event[4][1] == seq)
+        return True
+
+    def bind(self, camera_id, seq):
+        # Gắn camera và số thứ tự frame cho các span tiếp theo trên thread này nếu frame đã được chọn mẫu
+        if not self.enabled:
+            return
+        with self._lock:
+            sampled = seq in self._sampled.get(camera_id, ())
+        if sampled:
+            self._local.context = (camera_id, seq)
+            self.thread_names[threading.get_ident()] = threading.current_thread().name
+        else:
+            self._local.context = None
+
+    def add_capture_span(self, camera_id, seq, name, start_ns, end_ns):
+        # Thread capture chưa biết frame nào sẽ được detect chọn mẫu: giữ tạm trong bộ đệm vòng của camera
+        if not self.enabled:
+            return
+        self.thread_names[threading.get_ident()] = threading.current_thread().name
+        with self._lock:
+            pending = self._pending.setdefault(camera_id, deque(maxlen=PENDING_CAPTURE_EVENTS))
+            pending.append((name, start_ns, end_ns, threading.get_ident(), (camera_id, seq)))
+
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        context = getattr(self._local, 'context', None)
+        if context is None:
+            return _NULL_SPAN
+        return _Span(self, name, context)
+
+    def add_span(self, name, start_ns, end_ns):
+        # Cho các đoạn đã đo trước khi biết frame nào (chờ scheduler, chờ frame_lock)
+        if not self.enabled:
+            return
+        context = getattr(self._local, 'context', None)
+        if context is not None:
+            self.events.append((name, start_ns, end_ns, threading.get_ident(), context))
+
+    def export(self, path):
+        pid = os.getpid()
+        trace_events = [{
+            'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}
+        } for tid, name in list(self.thread_names.items())]
+
+        for name, start_ns, end_ns, tid, (camera_id, seq) in list(self.events):
+            trace_events.append({
+                'name': name,
+                'cat': 'pipeline',
+                'ph': 'X',
+                'ts': start_ns / 1000,
+                'dur': (end_ns - start_ns) / 1000,
+                'pid': pid,
+                'tid': tid,
+                'args': {'camera_id': camera_id, 'frame': seq}
+            })
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+        return len(trace_events)
+
+tracer = Tracer()
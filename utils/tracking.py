@@ -12,6 +12,8 @@ class TrackedFace:
         self.unknown_duration = 0
         self.confidence_count = 1 
         self.missing_count = 0  
+        self.embedding = None
+        self.score = 0
 
 def compute_iou(box1, box2):
     x1, y1, w1, h1 = box1
@@ -33,4 +35,63 @@ def compute_iou(box1, box2):
     union_area = box1_area + box2_area - inter_area
     
     iou = inter_area / union_area if union_area > 0 else 0
-    return iou
\ No newline at end of file
+    return iou
+
+MIN_CONFIDENCE_FRAMES = 2
+MAX_MISSING_FRAMES = 3
+
+def update_tracks(tracked_faces, detections, face_id_counter, current_time):
+    new_tracked_faces = {}
+    detected_face_ids = set()
+
+    for detection in detections:
+        bbox = detection['bbox']
+        name = detection['name']
+        recognized = detection['recognized']
+
+        matched_face_id = None
+        max_iou = 0
+
+        for face_id, tracked_face in tracked_faces.items():
+            iou = compute_iou(bbox, tracked_face.bbox)
+            if iou > 0.35 and iou > max_iou:
+                max_iou = iou
+                matched_face_id = face_id
+
+        if matched_face_id is not None:
+            tracked_face = tracked_faces[matched_face_id]
+            tracked_face.bbox = bbox
+            tracked_face.confidence_count += 1
+            tracked_face.missing_count = 0
+
+            if tracked_face.confidence_count >= MIN_CONFIDENCE_FRAMES:
+                if tracked_face.recognized != recognized or tracked_face.name != name:
+                    tracked_face.name = name
+                    tracked_face.recognized = recognized
+                    tracked_face.state_duration = 0
+                    tracked_face.current_state_start_time = current_time
+
+            tracked_face.embedding = detection.get('embedding')
+            tracked_face.score = detection.get('score', 0)
+            tracked_face.last_update_time = current_time
+            new_tracked_faces[matched_face_id] = tracked_face
+            detected_face_ids.add(matched_face_id)
+        else:
+            face_id_counter += 1
+            new_face = TrackedFace(face_id_counter, bbox, name, recognized, current_time)
+            new_face.embedding = detection.get('embedding')
+            new_face.score = detection.get('score', 0)
+            # Người vừa được thấy gần đây (camera khác hoặc track bị mất) được xác nhận ngay
+            if detection.get('cached'):
+                new_face.confidence_count = MIN_CONFIDENCE_FRAMES
+            new_tracked_faces[face_id_counter] = new_face
+            detected_face_ids.add(face_id_counter)
+
+    for face_id, tracked_face in tracked_faces.items():
+        if face_id not in detected_face_ids:
+            tracked_face.missing_count += 1
+            tracked_face.confidence_count = max(0, tracked_face.confidence_count - 1)
+            if tracked_face.missing_count < MAX_MISSING_FRAMES:
+                new_tracked_faces[face_id] = tracked_face
+
+    return new_tracked_faces, face_id_counter